@@ -1,13 +1,38 @@
 import base64
 import gc
+import time
+import logging
+import threading
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from langchain_core.messages import HumanMessage, AIMessage
-from models.llm_model import llm
-from models.vectorstore import vectorstore
+from models.registry import registry
+from models.llm_model import get_llm
+from models.vectorstore import get_vectorstore
+from models.docstore import get_docstore
+from models.embedding_model import get_embedding_model
+from models.retrieval_classifier import get_retrieval_classifier
+from models.answer_cache import get_answer_cache
 from models.prompt_templates import answer_prompt_template
 from utils.classifier import needs_retrieval
-from retriever.hybrid_retrieval import hybrid_retrieve
+from retriever.hybrid_retrieval import hybrid_retrieve, with_parent_documents
+from retriever.context_packing import pack_context
+from config import (
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_CANDIDATES,
+    CONTEXT_MMR_LAMBDA,
+    CONTEXT_MIN_PASSAGE_TOKENS,
+    CLASSIFY_TIMEOUT_SECONDS,
+    RETRIEVAL_TIMEOUT_SECONDS,
+    CHAT_TURN_WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Resources classification and retrieval need within a turn.
+TURN_RESOURCES = ["embedding_model", "vectorstore", "bm25_index", "docstore", "retrieval_classifier", "token_encoding", "llm"]
 
 @st.cache_data(show_spinner=False)
 def load_logo_base64():
@@ -15,30 +40,12 @@ def load_logo_base64():
         return base64.b64encode(f.read()).decode()
 
 @st.cache_resource(show_spinner=False)
-def get_llm():
-    return llm
-
-@st.cache_resource(show_spinner=False)
-def get_vectorstore():
-    return vectorstore
-
-@st.cache_resource(show_spinner=False)
-def get_prompt_template():
-    return answer_prompt_template
+def start_resource_warm_up():
+    # Load models and indexes in the background so the page renders immediately;
+    # the first chat turn waits only for whatever has not finished loading yet.
+    return registry.warm_up(TURN_RESOURCES + ["answer_cache"])
 
-@st.cache_resource(show_spinner=False)
-def get_classifier():
-    return needs_retrieval
-
-@st.cache_resource(show_spinner=False)
-def get_retriever():
-    return hybrid_retrieve
-
-llm = get_llm()
-vectorstore = get_vectorstore()
-answer_prompt_template = get_prompt_template()
-needs_retrieval = get_classifier()
-hybrid_retrieve = get_retriever()
+start_resource_warm_up()
 menomind_logo_base64 = load_logo_base64()
 
 st.set_page_config(
@@ -111,13 +118,97 @@ user_avatar = "👩‍🦰"
 assistant_avatar = "🤖"
 
 @st.cache_data(show_spinner=False)
-def classify_query(_query, _llm_instance):
-    return needs_retrieval(_query, _llm_instance)
+def classify_query(query):
+    return needs_retrieval(query, get_llm(), classifier=get_retrieval_classifier(), embeddings=get_embedding_model())
 
 @st.cache_data(show_spinner=False)
-def retrieve_context(_query, _vectorstore_instance):
-    docs = hybrid_retrieve(_query, _vectorstore_instance)
-    return "\n\n".join(doc.page_content for doc in docs[:10])
+def retrieve_context(query):
+    docs = with_parent_documents(hybrid_retrieve(query, get_vectorstore(), k=CONTEXT_CANDIDATES), get_docstore())
+    context, _ = pack_context(docs, CONTEXT_TOKEN_BUDGET, mmr_lambda=CONTEXT_MMR_LAMBDA, min_passage_tokens=CONTEXT_MIN_PASSAGE_TOKENS)
+    return context
+
+@st.cache_resource(show_spinner=False)
+def get_turn_executor():
+    # Shared by every session; time a task spends queued counts against the turn timeouts.
+    return ThreadPoolExecutor(max_workers=CHAT_TURN_WORKERS, thread_name_prefix="chat-turn")
+
+def run_with_script_context(fn, ctx, *args):
+    # Lets st.cache_data work from executor threads.
+    add_script_run_ctx(threading.current_thread(), ctx)
+    return fn(*args)
+
+def wait_for_turn_resources():
+    # The turn timeouts cover classification and retrieval, not the one-off model loading the
+    # warm-up started, so a turn right after a cold start first waits for those resources.
+    pending = [name for name in TURN_RESOURCES if not registry.is_ready(name)]
+    if not pending:
+        return
+    with st.spinner("Loading models..."):
+        for name in pending:
+            try:
+                registry.get(name)
+            except Exception as e:
+                logger.error(f"Resource '{name}' failed to load: {e}")
+
+def gather_context(query):
+    # Retrieval starts speculatively alongside classification and its result is discarded if the
+    # query turns out not to need it. A classification that fails or times out falls back to
+    # using the retrieved context; a retrieval that fails or times out yields no context.
+    # Cancellation only stops work that has not started yet; running calls finish in the background.
+    # Returns (context, degraded), where degraded means the context was needed but is missing.
+    wait_for_turn_resources()
+    ctx = get_script_run_ctx()
+    executor = get_turn_executor()
+    started = time.monotonic()
+    classify_future = executor.submit(run_with_script_context, classify_query, ctx, query)
+    retrieve_future = executor.submit(run_with_script_context, retrieve_context, ctx, query)
+
+    try:
+        needs_context = classify_future.result(timeout=CLASSIFY_TIMEOUT_SECONDS)
+    except FutureTimeoutError:
+        logger.warning(f"Query classification timed out after {CLASSIFY_TIMEOUT_SECONDS}s; using retrieved context.")
+        classify_future.cancel()
+        needs_context = True
+    except Exception as e:
+        logger.error(f"Query classification failed: {e}; using retrieved context.")
+        needs_context = True
+
+    if not needs_context:
+        retrieve_future.cancel()
+        return "", False
+
+    try:
+        return retrieve_future.result(timeout=max(0.0, RETRIEVAL_TIMEOUT_SECONDS - (time.monotonic() - started))), False
+    except FutureTimeoutError:
+        logger.warning(f"Retrieval timed out after {RETRIEVAL_TIMEOUT_SECONDS}s; answering without context.")
+        retrieve_future.cancel()
+        return "", True
+    except Exception as e:
+        logger.error(f"Retrieval failed: {e}; answering without context.")
+        return "", True
+
+def lookup_cached_answer(query):
+    # Returns (answer, query embedding); both are None when the cache is disabled or unavailable.
+    # Cache failures never break the turn; the question is answered as if it were a miss.
+    try:
+        answer_cache = get_answer_cache()
+        if answer_cache is None:
+            return None, None
+        embedding = get_embedding_model().embed_query(query)
+        return answer_cache.get(embedding), embedding
+    except Exception as e:
+        logger.error(f"Answer cache lookup failed: {e}")
+        return None, None
+
+def store_cached_answer(query, embedding, answer):
+    if embedding is None:
+        return
+    try:
+        answer_cache = get_answer_cache()
+        if answer_cache is not None:
+            answer_cache.put(query, embedding, answer)
+    except Exception as e:
+        logger.error(f"Storing answer in the cache failed: {e}")
 
 def format_chat_history_for_prompt(chat_hist_list_of_messages):
     formatted_history_lines = []
@@ -146,43 +237,59 @@ if user_input:
     start_time = datetime.now()
     conversation_history_str = format_chat_history_for_prompt(st.session_state.chat_history)
 
-    if classify_query(user_input, llm):
-        context = retrieve_context(user_input, vectorstore)
-    else:
-        context = ""
-
-    final_prompt = answer_prompt_template.format(
-        context=context,
-        question=user_input,
-        conversation_history=conversation_history_str
-    )
+    # Only a question asked without prior conversation can reuse (or seed) a cached answer,
+    # since later answers depend on what was said before.
+    first_turn = len(st.session_state.chat_history) == 1
+    cached_answer, query_embedding = lookup_cached_answer(user_input) if first_turn else (None, None)
 
     with st.chat_message("assistant", avatar=assistant_avatar):
         response_placeholder = st.empty()
         streamed_response_content = ""
-        try:
-            for chunk in llm.stream(final_prompt):
-                chunk_text = ""
-                if hasattr(chunk, 'content') and chunk.content is not None:
-                    chunk_text = chunk.content
-                elif isinstance(chunk, str):
-                    chunk_text = chunk
-
-                if chunk_text:
-                    streamed_response_content += chunk_text
-                    response_placeholder.markdown(streamed_response_content + "|")
-            
+        if cached_answer is not None:
+            streamed_response_content = cached_answer
             elapsed_time = (datetime.now() - start_time).total_seconds()
             response_placeholder.markdown(
                 f"{streamed_response_content}\n\n"
                 f"<div style='font-size:10px; color:#999; margin-top:4px;'>"
-                f"⏱️ Response time: {elapsed_time:.2f} seconds</div>",
+                f"⏱️ Response time: {elapsed_time:.2f} seconds (cached answer)</div>",
                 unsafe_allow_html=True
             )
-        except Exception as e:
-            st.error(f"Error streaming response: {e}")
-            streamed_response_content = "I apologize, but I encountered an issue generating my response."
-            response_placeholder.markdown(streamed_response_content)
+        else:
+            try:
+                context, context_degraded = gather_context(user_input)
+
+                final_prompt = answer_prompt_template.format(
+                    context=context,
+                    question=user_input,
+                    conversation_history=conversation_history_str
+                )
+
+                for chunk in get_llm().stream(final_prompt):
+                    chunk_text = ""
+                    if hasattr(chunk, 'content') and chunk.content is not None:
+                        chunk_text = chunk.content
+                    elif isinstance(chunk, str):
+                        chunk_text = chunk
+
+                    if chunk_text:
+                        streamed_response_content += chunk_text
+                        response_placeholder.markdown(streamed_response_content + "|")
+            
+                elapsed_time = (datetime.now() - start_time).total_seconds()
+                response_placeholder.markdown(
+                    f"{streamed_response_content}\n\n"
+                    f"<div style='font-size:10px; color:#999; margin-top:4px;'>"
+                    f"⏱️ Response time: {elapsed_time:.2f} seconds</div>",
+                    unsafe_allow_html=True
+                )
+            except Exception as e:
+                st.error(f"Error streaming response: {e}")
+                streamed_response_content = "I apologize, but I encountered an issue generating my response."
+                response_placeholder.markdown(streamed_response_content)
+            else:
+                # An answer given without the context it needed is never shared with other users.
+                if first_turn and streamed_response_content and not context_degraded:
+                    store_cached_answer(user_input, query_embedding, streamed_response_content)
 
     st.session_state.messages.append({"role": "user", "content": user_input})
     
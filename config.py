@@ -5,7 +5,114 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 SOURCE_PDF_DIR = os.path.join(DATA_DIR, "test_pdfs")
 
+# Number of processes used for hi_res PDF extraction; 1 keeps extraction in-process.
+PDF_WORKERS = 1
+# With more than one worker, PDFs of at least PDF_SHARD_MIN_PAGES pages are split into
+# PDF_PAGES_PER_SHARD-page ranges that are partitioned concurrently.
+PDF_SHARD_MIN_PAGES = 40
+PDF_PAGES_PER_SHARD = 10
+
 OUTPUT_DIR = os.path.join(BASE_DIR, "output")
 CHROMA_DB_DIR = os.path.join(OUTPUT_DIR, "chroma_db")
+SPARSE_INDEX_DIR = os.path.join(OUTPUT_DIR, "bm25_index")
+# Parent contents (raw text, table text, image digests) keyed by the doc_id stored with each summary.
+DOCSTORE_PATH = os.path.join(OUTPUT_DIR, "docstore.sqlite")
+EXTRACTION_CACHE_DIR = os.path.join(OUTPUT_DIR, "extraction_cache")
+# Raw image bytes, stored once each by sha256; documents and caches only carry the digest.
+BLOB_STORE_DIR = os.path.join(OUTPUT_DIR, "blobs")
+SUMMARY_CACHE_PATH = os.path.join(OUTPUT_DIR, "summary_cache.sqlite")
+
+# Bump PIPELINE_VERSION whenever extraction, splitting, summarization or embedding changes
+# in a way that should force every PDF to be re-ingested.
+PIPELINE_VERSION = "1"
+INGESTION_MANIFEST_PATH = os.path.join(OUTPUT_DIR, "ingestion_manifest.json")
+
+# Ingestion streams PDFs through bounded queues of PIPELINE_QUEUE_SIZE items per stage and
+# writes to the indexes every INDEX_BATCH_SIZE document entries.
+PIPELINE_QUEUE_SIZE = 2
+INDEX_BATCH_SIZE = 256
+
+# Text chunks whose estimated Jaccard similarity (MinHash over NEAR_DUPLICATE_SHINGLE_SIZE-word
+# shingles) to an earlier chunk of the run reaches NEAR_DUPLICATE_THRESHOLD are indexed once;
+# set the threshold to None to index every chunk.
+NEAR_DUPLICATE_THRESHOLD = 0.85
+NEAR_DUPLICATE_NUM_PERM = 128
+NEAR_DUPLICATE_SHINGLE_SIZE = 5
+
+EMBEDDING_MODEL_NAME = "BAAI/bge-large-en-v1.5"
+# One of "torch" (fp32 reference), "torch-int8" (dynamic int8 quantization) or "onnx" (ONNX Runtime).
+EMBEDDING_BACKEND = "torch"
+EMBEDDING_BATCH_SIZE = 32
+EMBEDDING_NUM_THREADS = None
+EMBEDDING_MAX_SEQ_LENGTH = 512
+# The "onnx" backend exports the model here on first use and loads the export afterwards.
+EMBEDDING_ONNX_EXPORT_DIR = os.path.join(OUTPUT_DIR, "onnx")
+
+DOCUMENT_EMBEDDING_CACHE_DIR = os.path.join(OUTPUT_DIR, "embedding_cache")
+DOCUMENT_EMBEDDING_CACHE_DTYPE = "float16"
+
+QUERY_EMBEDDING_CACHE_SIZE = 2048
+QUERY_EMBEDDING_CACHE_PATH = os.path.join(OUTPUT_DIR, "query_embedding_cache.npz")
+
+# Logged LLM retrieval decisions train the local classifier (python -m models.retrieval_classifier_training).
+RETRIEVAL_DECISION_LOG_PATH = os.path.join(OUTPUT_DIR, "retrieval_decisions.jsonl")
+RETRIEVAL_CLASSIFIER_PATH = os.path.join(OUTPUT_DIR, "retrieval_classifier.npz")
+
+# Per chat turn, classification and (speculative) retrieval run concurrently on a pool of
+# CHAT_TURN_WORKERS threads shared by all sessions. Both timeouts count from when the models
+# they need have finished loading; retrieval's includes the time spent classifying.
+CLASSIFY_TIMEOUT_SECONDS = 5.0
+RETRIEVAL_TIMEOUT_SECONDS = 10.0
+CHAT_TURN_WORKERS = 8
+
+# First-turn questions whose embedding is at least ANSWER_CACHE_SIMILARITY_THRESHOLD cosine-similar
+# to an earlier one get the stored answer. Backend is "sqlite" (shared by every app process),
+# "memory" (per process) or None (disabled).
+ANSWER_CACHE_BACKEND = "sqlite"
+ANSWER_CACHE_PATH = os.path.join(OUTPUT_DIR, "answer_cache.sqlite")
+ANSWER_CACHE_SIMILARITY_THRESHOLD = 0.95
+ANSWER_CACHE_TTL_SECONDS = 7 * 24 * 3600
+ANSWER_CACHE_MAX_ENTRIES = 1000
+
+HYBRID_FUSION_METHOD = "rrf"
+HYBRID_FUSION_WEIGHTS = {"dense": 1.0, "sparse": 1.0}
+HYBRID_RRF_K = 60
+HYBRID_MAX_WORKERS = 4
+
+# The answer prompt gets at most CONTEXT_TOKEN_BUDGET tokens of context, packed from the top
+# CONTEXT_CANDIDATES fused results with MMR (CONTEXT_MMR_LAMBDA trades relevance for diversity).
+# Tokens are counted with the tiktoken CONTEXT_TOKEN_ENCODING encoding; Gemini's own tokenizer
+# gives similar but not identical counts.
+CONTEXT_TOKEN_ENCODING = "cl100k_base"
+CONTEXT_TOKEN_BUDGET = 3000
+CONTEXT_CANDIDATES = 20
+CONTEXT_MMR_LAMBDA = 0.7
+CONTEXT_MIN_PASSAGE_TOKENS = 40
+
+# Table and image summarization share one budget: SUMMARIZER_REQUESTS_PER_MINUTE requests and
+# SUMMARIZER_TOKENS_PER_MINUTE prompt tokens, with up to SUMMARIZER_MAX_CONCURRENCY requests in flight.
+SUMMARIZER_REQUESTS_PER_MINUTE = 14
+SUMMARIZER_TOKENS_PER_MINUTE = 1_000_000
+SUMMARIZER_MAX_CONCURRENCY = 8
+SUMMARIZER_MAX_RETRIES = 5
+# Small tables are packed into one request of at most TABLE_BATCH_TOKEN_BUDGET prompt tokens and
+# TABLE_BATCH_MAX_TABLES tables; a budget of 0 summarizes every table on its own. All summaries of
+# a batch come back in one response, so a batch also holds at most TABLE_BATCH_OUTPUT_TOKEN_BUDGET
+# tokens of replies at an expected TABLE_SUMMARY_OUTPUT_TOKENS each (gemini-2.0-flash stops at 8192).
+TABLE_BATCH_TOKEN_BUDGET = 8000
+TABLE_BATCH_MAX_TABLES = 8
+TABLE_BATCH_OUTPUT_TOKEN_BUDGET = 6000
+TABLE_SUMMARY_OUTPUT_TOKENS = 600
+# Images smaller than IMAGE_MIN_SIZE pixels on either side are dropped, the rest are downscaled to
+# at most IMAGE_MAX_RESOLUTION pixels per side, and images whose perceptual hashes differ by at
+# most IMAGE_DUPLICATE_HASH_DISTANCE bits share one summary.
+IMAGE_MIN_SIZE = 64
+IMAGE_MAX_RESOLUTION = 1024
+IMAGE_JPEG_QUALITY = 85
+IMAGE_DUPLICATE_HASH_DISTANCE = 4
+# Points the Gemini clients at another host (e.g. a local fake server). Synchronous calls use
+# REST, but langchain-google-genai's async client (used by the summarizers) always speaks gRPC,
+# so the endpoint must serve both.
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
 
 os.makedirs(CHROMA_DB_DIR, exist_ok=True)
\ No newline at end of file
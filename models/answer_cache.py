@@ -0,0 +1,221 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from models.registry import registry
+from config import (
+    PIPELINE_VERSION,
+    INGESTION_MANIFEST_PATH,
+    ANSWER_CACHE_BACKEND,
+    ANSWER_CACHE_PATH,
+    ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    ANSWER_CACHE_TTL_SECONDS,
+    ANSWER_CACHE_MAX_ENTRIES,
+)
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def index_version(manifest_path=INGESTION_MANIFEST_PATH):
+    # The manifest is only rewritten when an ingestion or compaction run changes the indexes, which
+    # is exactly when cached answers may no longer match what retrieval would return.
+    try:
+        stat = os.stat(manifest_path)
+    except OSError:
+        return f"{PIPELINE_VERSION}:none"
+    return f"{PIPELINE_VERSION}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class AnswerCacheBackend(ABC):
+    # Storage for SemanticAnswerCache. lookup returns (entry_id, answer, similarity) for the most
+    # similar live entry of index_version created at or after not_before, or None.
+    @abstractmethod
+    def lookup(self, embedding, index_version, not_before):
+        pass
+
+    @abstractmethod
+    def store(self, query, embedding, answer, index_version, now):
+        pass
+
+    @abstractmethod
+    def touch(self, entry_id, now):
+        pass
+
+    @abstractmethod
+    def evict(self, index_version, not_before, max_entries):
+        pass
+
+
+class InMemoryAnswerCacheBackend(AnswerCacheBackend):
+    # Per-process backend.
+    def __init__(self):
+        self.entries = {}
+        self.next_id = 0
+        self.lock = threading.Lock()
+
+    def lookup(self, embedding, index_version, not_before):
+        with self.lock:
+            live = [
+                (entry_id, entry) for entry_id, entry in self.entries.items()
+                if entry["index_version"] == index_version and entry["created_at"] >= not_before
+            ]
+        if not live:
+            return None
+        similarities = np.stack([entry["embedding"] for _, entry in live]) @ embedding
+        best = int(np.argmax(similarities))
+        return live[best][0], live[best][1]["answer"], float(similarities[best])
+
+    def store(self, query, embedding, answer, index_version, now):
+        with self.lock:
+            self.entries[self.next_id] = {
+                "query": query,
+                "embedding": embedding,
+                "answer": answer,
+                "index_version": index_version,
+                "created_at": now,
+                "last_used": now,
+            }
+            self.next_id += 1
+
+    def touch(self, entry_id, now):
+        with self.lock:
+            if entry_id in self.entries:
+                self.entries[entry_id]["last_used"] = now
+
+    def evict(self, index_version, not_before, max_entries):
+        with self.lock:
+            for entry_id in [
+                entry_id for entry_id, entry in self.entries.items()
+                if entry["index_version"] != index_version or entry["created_at"] < not_before
+            ]:
+                del self.entries[entry_id]
+            overflow = len(self.entries) - max_entries
+            if overflow > 0:
+                for entry_id in sorted(self.entries, key=lambda entry_id: self.entries[entry_id]["last_used"])[:overflow]:
+                    del self.entries[entry_id]
+
+
+class SQLiteAnswerCacheBackend(AnswerCacheBackend):
+    # Shared on-disk backend: every app process pointing at the same file sees the same answers.
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, query TEXT NOT NULL, embedding BLOB NOT NULL, "
+            "answer TEXT NOT NULL, index_version TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def lookup(self, embedding, index_version, not_before):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, embedding, answer FROM answers WHERE index_version = ? AND created_at >= ?",
+                (index_version, not_before),
+            ).fetchall()
+        if not rows:
+            return None
+        similarities = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows]) @ embedding
+        best = int(np.argmax(similarities))
+        return rows[best][0], rows[best][2], float(similarities[best])
+
+    def store(self, query, embedding, answer, index_version, now):
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO answers (query, embedding, answer, index_version, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (query, embedding.astype(np.float32).tobytes(), answer, index_version, now, now),
+            )
+            self.conn.commit()
+
+    def touch(self, entry_id, now):
+        with self.lock:
+            self.conn.execute("UPDATE answers SET last_used = ? WHERE id = ?", (now, entry_id))
+            self.conn.commit()
+
+    def evict(self, index_version, not_before, max_entries):
+        with self.lock:
+            self.conn.execute("DELETE FROM answers WHERE index_version != ? OR created_at < ?", (index_version, not_before))
+            self.conn.execute(
+                "DELETE FROM answers WHERE id NOT IN (SELECT id FROM answers ORDER BY last_used DESC LIMIT ?)",
+                (max_entries,),
+            )
+            self.conn.commit()
+
+
+class SemanticAnswerCache:
+    # Serves a stored answer when a new query's embedding is at least `threshold` cosine-similar
+    # to a cached one. Entries expire after ttl_seconds, the least recently used are evicted
+    # beyond max_entries, and entries from another index version are never served.
+    def __init__(self, backend, threshold=0.95, ttl_seconds=7 * 24 * 3600, max_entries=1000, version_fn=index_version):
+        self.backend = backend
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.version_fn = version_fn
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, embedding):
+        now = time.time()
+        match = self.backend.lookup(_normalize(embedding), self.version_fn(), now - self.ttl_seconds)
+        if match is None or match[2] < self.threshold:
+            self.misses += 1
+            return None
+        entry_id, answer, similarity = match
+        self.backend.touch(entry_id, now)
+        self.hits += 1
+        logger.info(f"Answer cache hit (similarity {similarity:.3f}); hit rate {self.stats()['hit_rate']:.1%}.")
+        return answer
+
+    def put(self, query, embedding, answer):
+        now = time.time()
+        version = self.version_fn()
+        self.backend.store(query, _normalize(embedding), answer, version, now)
+        self.backend.evict(version, now - self.ttl_seconds, self.max_entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+ANSWER_CACHE_BACKENDS = {
+    "memory": lambda: InMemoryAnswerCacheBackend(),
+    "sqlite": lambda: SQLiteAnswerCacheBackend(ANSWER_CACHE_PATH),
+}
+
+def build_answer_cache():
+    if not ANSWER_CACHE_BACKEND:
+        return None
+    if ANSWER_CACHE_BACKEND not in ANSWER_CACHE_BACKENDS:
+        raise ValueError(f"Unknown answer cache backend '{ANSWER_CACHE_BACKEND}'. Expected one of {sorted(ANSWER_CACHE_BACKENDS)}.")
+    return SemanticAnswerCache(
+        ANSWER_CACHE_BACKENDS[ANSWER_CACHE_BACKEND](),
+        threshold=ANSWER_CACHE_SIMILARITY_THRESHOLD,
+        ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+        max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    )
+
+registry.register("answer_cache", build_answer_cache)
+
+def get_answer_cache():
+    return registry.get("answer_cache")
\ No newline at end of file
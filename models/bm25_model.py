@@ -1,9 +1,387 @@
-from rank_bm25 import BM25Okapi
+import os
+import json
+import shutil
+import logging
+from collections import Counter
+
+import numpy as np
 from nltk.tokenize import word_tokenize
-from models.vectorstore import vectorstore
 
-docs = vectorstore.get()['documents']
+from models.registry import registry
+from models.vectorstore import get_vectorstore
+from config import SPARSE_INDEX_DIR
+
+INDEX_FORMAT_VERSION = 2
+
+
+def tokenize(text):
+    return word_tokenize((text or "").lower())
+
+
+class BM25Index:
+    # Okapi BM25 over an on-disk inverted index. Postings are stored per segment in CSR layout
+    # (offsets by term id, doc ids, term frequencies) as .npy files that are memory-mapped on load.
+    # Appends write a new segment; segments are merged once there are more than max_segments.
+    # df, idf, vocab and doc ids are written to a fresh generation directory on every save and
+    # meta.json, swapped in last, names the generation and segments that make up the index.
+    def __init__(self, index_dir, k1=1.5, b=0.75, epsilon=0.25, max_segments=8):
+        self.index_dir = index_dir
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.max_segments = max_segments
+
+        self.vocab = {}
+        self.terms = []
+        self.doc_ids = []
+        self.segments = []
+        self.df = np.zeros(0, dtype=np.int64)
+        self.idf = np.zeros(0, dtype=np.float32)
+        self.total_length = 0
+        self.next_segment = 0
+        self.generation = 0
+        self.stale_segments = []
+
+        self.logger = self.setup_logger()
+
+    def setup_logger(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        return logging.getLogger(__name__)
+
+    @property
+    def num_docs(self):
+        return len(self.doc_ids)
+
+    @property
+    def avgdl(self):
+        return self.total_length / self.num_docs if self.num_docs else 0.0
+
+    @staticmethod
+    def exists(index_dir):
+        return os.path.isfile(os.path.join(index_dir, "meta.json"))
+
+    def _segment_dir(self, name):
+        return os.path.join(self.index_dir, "segments", name)
+
+    def _generation_file(self, generation, file_name):
+        # Relative to index_dir, as _read_json and _write_json expect.
+        return os.path.join("generations", f"{generation:05d}", file_name)
+
+    def _generation_dir(self, generation):
+        return os.path.join(self.index_dir, "generations", f"{generation:05d}")
+
+    def _term_ids(self, tokens, create=False):
+        ids = []
+        for token in tokens:
+            term_id = self.vocab.get(token)
+            if term_id is None:
+                if not create:
+                    continue
+                term_id = len(self.terms)
+                self.vocab[token] = term_id
+                self.terms.append(token)
+            ids.append(term_id)
+        return ids
+
+    def _build_segment(self, tokenized_docs, doc_base):
+        term_col, doc_col, tf_col = [], [], []
+        doc_lengths = np.zeros(len(tokenized_docs), dtype=np.int32)
+
+        for local_doc, tokens in enumerate(tokenized_docs):
+            doc_lengths[local_doc] = len(tokens)
+            counts = Counter(self._term_ids(tokens, create=True))
+            term_col.extend(counts.keys())
+            doc_col.extend([local_doc] * len(counts))
+            tf_col.extend(counts.values())
+
+        return self._segment_from_triples(
+            np.asarray(term_col, dtype=np.int64),
+            np.asarray(doc_col, dtype=np.int32),
+            np.asarray(tf_col, dtype=np.int32),
+            doc_lengths,
+            doc_base,
+        )
+
+    def _segment_from_triples(self, term_col, doc_col, tf_col, doc_lengths, doc_base):
+        order = np.lexsort((doc_col, term_col))
+        term_col = term_col[order]
+        counts = np.bincount(term_col, minlength=len(self.terms))
+        offsets = np.zeros(len(self.terms) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        name = f"{self.next_segment:05d}"
+        self.next_segment += 1
+        return {
+            "name": name,
+            "doc_base": doc_base,
+            "offsets": offsets,
+            "postings": doc_col[order],
+            "tfs": tf_col[order],
+            "doc_lengths": doc_lengths,
+            "dirty": True,
+        }
+
+    def _update_df(self, segment):
+        df = np.zeros(len(self.terms), dtype=np.int64)
+        df[:len(self.df)] = self.df
+        df[:len(segment["offsets"]) - 1] += np.diff(segment["offsets"])
+        self.df = df
+
+    def _compute_idf(self):
+        # Same formula as rank_bm25.BM25Okapi: negative idf values are floored at epsilon * mean idf.
+        present = self.df > 0
+        df = self.df.astype(np.float64)
+        idf = np.log(self.num_docs - df + 0.5) - np.log(df + 0.5)
+        idf[~present] = 0.0
+        if present.any():
+            eps = self.epsilon * idf[present].mean()
+            idf[present & (idf < 0)] = eps
+        self.idf = idf.astype(np.float32)
+
+    def _append_segment(self, ids, texts):
+        tokenized_docs = [tokenize(text) for text in texts]
+        segment = self._build_segment(tokenized_docs, doc_base=self.num_docs)
+
+        self.segments.append(segment)
+        self.doc_ids.extend(ids)
+        self.total_length += int(segment["doc_lengths"].sum())
+        self._update_df(segment)
+
+    def add_documents(self, ids, texts, save=True):
+        if len(ids) != len(texts):
+            raise ValueError(f"Got {len(ids)} ids for {len(texts)} texts.")
+        if not ids:
+            return
+
+        self._append_segment(ids, texts)
+        self._compute_idf()
+
+        if len(self.segments) > self.max_segments:
+            self.merge_segments()
+
+        self.logger.info(f"Appended {len(ids)} documents to BM25 index ({self.num_docs} total).")
+        if save:
+            self.save()
+
+    def upsert_documents(self, ids, texts, save=True):
+        # Replaces any documents already indexed under these ids, so re-indexing is idempotent.
+        self.delete_documents(ids, save=False)
+        self.add_documents(ids, texts, save=save)
+
+    def _segment_triples(self, segment):
+        offsets = np.asarray(segment["offsets"])
+        term_col = np.repeat(np.arange(len(offsets) - 1, dtype=np.int64), np.diff(offsets))
+        doc_col = np.asarray(segment["postings"], dtype=np.int32) + segment["doc_base"]
+        return term_col, doc_col, np.asarray(segment["tfs"], dtype=np.int32)
+
+    def merge_segments(self, keep=None):
+        # keep is an optional boolean mask over documents; documents outside it are dropped
+        # and the survivors renumbered, which also brings df, idf and avgdl back in sync.
+        if len(self.segments) <= 1 and keep is None:
+            return
+
+        triples = [self._segment_triples(segment) for segment in self.segments]
+        term_col = np.concatenate([t[0] for t in triples]) if triples else np.zeros(0, dtype=np.int64)
+        doc_col = np.concatenate([t[1] for t in triples]) if triples else np.zeros(0, dtype=np.int32)
+        tf_col = np.concatenate([t[2] for t in triples]) if triples else np.zeros(0, dtype=np.int32)
+        doc_lengths = np.concatenate([np.asarray(s["doc_lengths"]) for s in self.segments]) if triples else np.zeros(0, dtype=np.int32)
+
+        if keep is not None:
+            kept_postings = keep[doc_col]
+            new_doc_index = np.cumsum(keep) - 1
+            term_col, tf_col = term_col[kept_postings], tf_col[kept_postings]
+            doc_col = new_doc_index[doc_col[kept_postings]].astype(np.int32)
+            doc_lengths = doc_lengths[keep]
+            self.doc_ids = [doc_id for doc_id, kept in zip(self.doc_ids, keep) if kept]
+            self.total_length = int(doc_lengths.sum())
+
+        merged = self._segment_from_triples(term_col, doc_col, tf_col, doc_lengths, doc_base=0)
+        stale = [s["name"] for s in self.segments]
+        self.segments = [merged]
+        self.stale_segments.extend(stale)
+
+        if keep is not None:
+            self.df = np.diff(merged["offsets"])
+            self._compute_idf()
+        self.logger.info(f"Merged {len(stale)} BM25 segments.")
+
+    def delete_documents(self, ids, save=True):
+        targets = set(ids)
+        keep = np.array([doc_id not in targets for doc_id in self.doc_ids], dtype=bool)
+        removed = int((~keep).sum())
+        if not removed:
+            return 0
+
+        self.merge_segments(keep=keep)
+        self.logger.info(f"Deleted {removed} documents from BM25 index ({self.num_docs} remaining).")
+        if save:
+            self.save()
+        return removed
+
+    def _accumulate(self, query_tokens, scores):
+        # Reads only the postings of the query terms; returns the doc indices that were touched.
+        touched = []
+        avgdl = self.avgdl
+        for term_id, query_freq in Counter(self._term_ids(query_tokens)).items():
+            idf = self.idf[term_id]
+            for segment in self.segments:
+                offsets = segment["offsets"]
+                if term_id >= len(offsets) - 1:
+                    continue
+                start, end = offsets[term_id], offsets[term_id + 1]
+                if start == end:
+                    continue
+                docs = np.asarray(segment["postings"][start:end])
+                tfs = np.asarray(segment["tfs"][start:end], dtype=np.float32)
+                doc_len = np.asarray(segment["doc_lengths"][docs], dtype=np.float32)
+                denom = tfs + self.k1 * (1 - self.b + self.b * doc_len / avgdl)
+                global_docs = docs + segment["doc_base"]
+                scores[global_docs] += query_freq * idf * tfs * (self.k1 + 1) / denom
+                touched.append(global_docs)
+        return touched
+
+    def get_scores(self, query_tokens):
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        if self.num_docs:
+            self._accumulate(query_tokens, scores)
+        return scores
+
+    def top_k(self, query_tokens, k):
+        if not self.num_docs or k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        touched = self._accumulate(query_tokens, scores)
+        if not touched:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        candidates = np.unique(np.concatenate(touched))
+        candidate_scores = scores[candidates]
+        if len(candidates) > k:
+            selected = np.argpartition(-candidate_scores, k - 1)[:k]
+            candidates, candidate_scores = candidates[selected], candidate_scores[selected]
+
+        order = np.lexsort((candidates, -candidate_scores))
+        return candidates[order], candidate_scores[order]
+
+    def search(self, query_tokens, k):
+        indices, scores = self.top_k(query_tokens, k)
+        return [(self.doc_ids[i], float(score)) for i, score in zip(indices, scores)]
+
+    def save(self):
+        os.makedirs(os.path.join(self.index_dir, "segments"), exist_ok=True)
+
+        for segment in self.segments:
+            if not segment.get("dirty"):
+                continue
+            segment_dir = self._segment_dir(segment["name"])
+            os.makedirs(segment_dir, exist_ok=True)
+            for key in ("offsets", "postings", "tfs", "doc_lengths"):
+                np.save(os.path.join(segment_dir, f"{key}.npy"), np.asarray(segment[key]))
+            segment["dirty"] = False
+
+        # Nothing the current meta.json points at is overwritten, so a crash before the meta swap
+        # leaves the previous index readable; the files it no longer needs are removed after.
+        previous_generation = self.generation
+        self.generation += 1
+        generation_dir = self._generation_dir(self.generation)
+        os.makedirs(generation_dir, exist_ok=True)
+        np.save(os.path.join(generation_dir, "df.npy"), self.df)
+        np.save(os.path.join(generation_dir, "idf.npy"), self.idf)
+        self._write_json(self._generation_file(self.generation, "vocab.json"), self.terms)
+        self._write_json(self._generation_file(self.generation, "doc_ids.json"), self.doc_ids)
+
+        self._write_json("meta.json", {
+            "format_version": INDEX_FORMAT_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "epsilon": self.epsilon,
+            "num_docs": self.num_docs,
+            "total_length": self.total_length,
+            "next_segment": self.next_segment,
+            "generation": self.generation,
+            "segments": [{"name": s["name"], "doc_base": s["doc_base"]} for s in self.segments],
+        })
+
+        if previous_generation:
+            shutil.rmtree(self._generation_dir(previous_generation), ignore_errors=True)
+        for name in self.stale_segments:
+            shutil.rmtree(self._segment_dir(name), ignore_errors=True)
+        self.stale_segments = []
+
+    def _write_json(self, file_name, payload):
+        path = os.path.join(self.index_dir, file_name)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+
+    def _read_json(self, file_name):
+        with open(os.path.join(self.index_dir, file_name), encoding="utf-8") as f:
+            return json.load(f)
+
+    @classmethod
+    def load(cls, index_dir, max_segments=8):
+        index = cls(index_dir, max_segments=max_segments)
+        meta = index._read_json("meta.json")
+        if meta.get("format_version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported BM25 index format: {meta.get('format_version')}")
+
+        index.k1, index.b, index.epsilon = meta["k1"], meta["b"], meta["epsilon"]
+        index.total_length = meta["total_length"]
+        index.next_segment = meta["next_segment"]
+        index.generation = meta["generation"]
+        generation_dir = index._generation_dir(index.generation)
+        index.terms = index._read_json(index._generation_file(index.generation, "vocab.json"))
+        index.vocab = {term: term_id for term_id, term in enumerate(index.terms)}
+        index.doc_ids = index._read_json(index._generation_file(index.generation, "doc_ids.json"))[:meta["num_docs"]]
+        index.df = np.load(os.path.join(generation_dir, "df.npy"))
+        index.idf = np.load(os.path.join(generation_dir, "idf.npy"))
+
+        for entry in meta["segments"]:
+            segment_dir = index._segment_dir(entry["name"])
+            segment = {"name": entry["name"], "doc_base": entry["doc_base"], "dirty": False}
+            for key in ("offsets", "postings", "tfs", "doc_lengths"):
+                segment[key] = np.load(os.path.join(segment_dir, f"{key}.npy"), mmap_mode="r")
+            index.segments.append(segment)
+
+        index.logger.info(f"Loaded BM25 index with {index.num_docs} documents from {index_dir}.")
+        return index
+
+    @classmethod
+    def build_from_vectorstore(cls, vectorstore, index_dir, page_size=1000):
+        if os.path.isdir(index_dir):
+            shutil.rmtree(index_dir)
+        index = cls(index_dir)
+
+        offset = 0
+        while True:
+            page = vectorstore.get(limit=page_size, offset=offset, include=["documents"])
+            ids = page["ids"]
+            if not ids:
+                break
+            index._append_segment(ids, page["documents"])
+            offset += len(ids)
+
+        index._compute_idf()
+        index.merge_segments()
+        index.save()
+        index.logger.info(f"Built BM25 index over {index.num_docs} documents.")
+        return index
+
+
+def load_or_build_bm25_index(index_dir=SPARSE_INDEX_DIR):
+    # Loading from disk never touches Chroma; the collection is only scanned for a full build.
+    if BM25Index.exists(index_dir):
+        try:
+            return BM25Index.load(index_dir)
+        except ValueError as e:
+            logging.getLogger(__name__).warning(f"{e}; rebuilding the BM25 index.")
+    return BM25Index.build_from_vectorstore(get_vectorstore(), index_dir)
+
+
+registry.register("bm25_index", load_or_build_bm25_index)
 
-tokenized_corpus = [word_tokenize(doc.lower()) for doc in docs]
 
-bm25 = BM25Okapi(tokenized_corpus)
\ No newline at end of file
+def get_bm25_index():
+    return registry.get("bm25_index")
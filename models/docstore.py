@@ -0,0 +1,74 @@
+import os
+import json
+import sqlite3
+import threading
+from typing import Iterator, Optional, Sequence
+from langchain_core.stores import BaseStore
+from models.registry import registry
+from config import DOCSTORE_PATH
+
+
+class SQLiteDocStore(BaseStore):
+    # Disk-backed key-value store for MultiVectorRetriever parents (raw text chunks, table text and
+    # image digests). Values are stored as JSON; mget/mset touch only the requested keys, in
+    # batches of at most max_variables so large lookups stay within SQLite's parameter limit.
+    def __init__(self, db_path, max_variables=500):
+        self.db_path = db_path
+        self.max_variables = max_variables
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS docstore (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.conn.commit()
+
+    def _chunks(self, keys):
+        for i in range(0, len(keys), self.max_variables):
+            yield keys[i:i + self.max_variables]
+
+    def mget(self, keys: Sequence[str]) -> list:
+        keys = list(keys)
+        found = {}
+        with self.lock:
+            for chunk in self._chunks(keys):
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(f"SELECT key, value FROM docstore WHERE key IN ({placeholders})", chunk)
+                found.update((key, json.loads(value)) for key, value in rows)
+        return [found.get(key) for key in keys]
+
+    def mset(self, key_value_pairs: Sequence[tuple]) -> None:
+        rows = [(key, json.dumps(value)) for key, value in key_value_pairs]
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO docstore (key, value) VALUES (?, ?)", rows)
+            self.conn.commit()
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        keys = list(keys)
+        with self.lock:
+            for chunk in self._chunks(keys):
+                placeholders = ",".join("?" * len(chunk))
+                self.conn.execute(f"DELETE FROM docstore WHERE key IN ({placeholders})", chunk)
+            self.conn.commit()
+
+    def yield_keys(self, prefix: Optional[str] = None) -> Iterator[str]:
+        with self.lock:
+            if prefix is None:
+                keys = [row[0] for row in self.conn.execute("SELECT key FROM docstore")]
+            else:
+                escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                keys = [row[0] for row in self.conn.execute("SELECT key FROM docstore WHERE key LIKE ? ESCAPE '\\'", (f"{escaped}%",))]
+        yield from keys
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM docstore").fetchone()[0]
+
+
+def build_docstore():
+    return SQLiteDocStore(DOCSTORE_PATH)
+
+registry.register("docstore", build_docstore)
+
+def get_docstore():
+    return registry.get("docstore")
\ No newline at end of file
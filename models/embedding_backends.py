@@ -0,0 +1,126 @@
+import os
+import shutil
+import logging
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_BACKENDS = ("torch", "torch-int8", "onnx")
+
+logger = logging.getLogger(__name__)
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    # Full-precision reference model, or the same model with every nn.Linear dynamically
+    # quantized to int8 (weights int8, activations quantized on the fly).
+    def __init__(self, model_name, quantize=False, batch_size=32, num_threads=None, max_seq_length=512):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.model.max_seq_length = max_seq_length
+        if quantize:
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model.eval()
+
+    def embed_documents(self, texts):
+        vectors = self.model.encode(list(texts), batch_size=self.batch_size, convert_to_numpy=True, show_progress_bar=False)
+        return vectors.tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class OnnxEmbeddings(Embeddings):
+    # ONNX Runtime export of the model. bge uses the [CLS] hidden state followed by L2
+    # normalization, which is reproduced here so vectors match the sentence-transformers output.
+    # With export_dir, the model is exported to ONNX once and loaded from there afterwards.
+    def __init__(self, model_name, batch_size=32, num_threads=None, max_seq_length=512, export_dir=None):
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        session_options = onnxruntime.SessionOptions()
+        if num_threads:
+            session_options.intra_op_num_threads = num_threads
+        session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.batch_size = batch_size
+        self.max_seq_length = max_seq_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model_dir = os.path.join(export_dir, model_name.replace("/", "__")) if export_dir else None
+        if model_dir and os.path.isdir(model_dir):
+            self.model = ORTModelForFeatureExtraction.from_pretrained(
+                model_dir,
+                export=False,
+                provider="CPUExecutionProvider",
+                session_options=session_options,
+            )
+            return
+
+        logger.info(f"Exporting {model_name} to ONNX.")
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            model_name,
+            export=True,
+            provider="CPUExecutionProvider",
+            session_options=session_options,
+        )
+        if model_dir:
+            # Saved under a temporary name and renamed, so an interrupted export is redone. If
+            # another process finished its export first, that one is kept.
+            tmp_dir = f"{model_dir}.tmp-{os.getpid()}"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            self.model.save_pretrained(tmp_dir)
+            try:
+                os.replace(tmp_dir, model_dir)
+                logger.info(f"Saved ONNX export of {model_name} to {model_dir}.")
+            except OSError:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _embed_batch(self, texts):
+        inputs = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np",
+        )
+        outputs = self.model(**inputs)
+        cls = np.asarray(outputs.last_hidden_state)[:, 0]
+        return cls / np.linalg.norm(cls, axis=1, keepdims=True)
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+        batches = [self._embed_batch(texts[i:i + self.batch_size]) for i in range(0, len(texts), self.batch_size)]
+        return np.concatenate(batches).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def build_embeddings(backend, model_name, batch_size=32, num_threads=None, max_seq_length=512, onnx_export_dir=None):
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}'. Expected one of {EMBEDDING_BACKENDS}.")
+
+    logger.info(f"Loading {model_name} with the '{backend}' embedding backend.")
+    if backend == "onnx":
+        return OnnxEmbeddings(
+            model_name,
+            batch_size=batch_size,
+            num_threads=num_threads,
+            max_seq_length=max_seq_length,
+            export_dir=onnx_export_dir,
+        )
+    return SentenceTransformerEmbeddings(
+        model_name,
+        quantize=backend == "torch-int8",
+        batch_size=batch_size,
+        num_threads=num_threads,
+        max_seq_length=max_seq_length,
+    )
\ No newline at end of file
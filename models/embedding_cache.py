@@ -0,0 +1,132 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+
+import numpy as np
+
+
+def normalize_text(text):
+    return " ".join((text or "").split())
+
+
+class EmbeddingCache:
+    # Append-only store of document embeddings keyed by sha256(model name, normalized text).
+    # Vectors live in a flat binary file read through np.memmap; keys.txt holds one key per row.
+    def __init__(self, cache_dir, model_name, dtype="float16"):
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype)
+        self.cache_dir = os.path.join(cache_dir, model_name.replace("/", "__"))
+        self.vectors_path = os.path.join(self.cache_dir, "vectors.bin")
+        self.keys_path = os.path.join(self.cache_dir, "keys.txt")
+        self.meta_path = os.path.join(self.cache_dir, "meta.json")
+
+        self.index = {}
+        self.rows = 0
+        self.dim = None
+        self.vectors = None
+        self.lock = threading.Lock()
+        self.logger = self.setup_logger()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.load()
+
+    def setup_logger(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        return logging.getLogger(__name__)
+
+    def key(self, text):
+        payload = f"{self.model_name}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def __len__(self):
+        return len(self.index)
+
+    def load(self):
+        if not os.path.isfile(self.meta_path):
+            return
+        with open(self.meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if np.dtype(meta["dtype"]) != self.dtype:
+            self.logger.warning(f"Embedding cache at {self.cache_dir} uses {meta['dtype']}; keeping that dtype.")
+            self.dtype = np.dtype(meta["dtype"])
+        self.dim = meta["dim"]
+
+        keys = []
+        if os.path.isfile(self.keys_path):
+            with open(self.keys_path, encoding="utf-8") as f:
+                for line in f:
+                    # A line cut short by a crash has no newline or an incomplete key.
+                    if not line.endswith("\n") or len(line) != 65:
+                        break
+                    keys.append(line[:64])
+        row_bytes = self.dim * self.dtype.itemsize
+        vector_bytes = os.path.getsize(self.vectors_path) if os.path.isfile(self.vectors_path) else 0
+        rows = min(len(keys), vector_bytes // row_bytes)
+
+        # A crash between or during the two appends leaves the files out of step. Cut both back
+        # to the rows they agree on so later appends land at the row the index records.
+        repaired = False
+        if vector_bytes != rows * row_bytes:
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(rows * row_bytes)
+            repaired = True
+        if os.path.isfile(self.keys_path) and os.path.getsize(self.keys_path) != rows * 65:
+            tmp_path = self.keys_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write("".join(f"{key}\n" for key in keys[:rows]))
+            os.replace(tmp_path, self.keys_path)
+            repaired = True
+        if repaired:
+            self.logger.warning(f"Truncated embedding cache at {self.cache_dir} to {rows} complete rows.")
+
+        self.index = {key: row for row, key in enumerate(keys[:rows])}
+        self.rows = rows
+        self._map(rows)
+        self.logger.info(f"Loaded {rows} cached document embeddings from {self.cache_dir}.")
+
+    def _map(self, rows):
+        if rows:
+            self.vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode="r", shape=(rows, self.dim))
+        else:
+            self.vectors = None
+
+    def get_many(self, keys):
+        with self.lock:
+            results = []
+            for key in keys:
+                row = self.index.get(key)
+                results.append(None if row is None else np.asarray(self.vectors[row], dtype=np.float32))
+            return results
+
+    def put_many(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(keys):
+            return
+
+        with self.lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model_name": self.model_name, "dim": self.dim, "dtype": self.dtype.name}, f)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional embeddings, got {vectors.shape[1]}.")
+
+            new_rows = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self.index:
+                    new_rows.setdefault(key, vector)
+            new_rows = list(new_rows.items())
+            if not new_rows:
+                return
+
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.stack([v for _, v in new_rows]).astype(self.dtype).tobytes())
+            with open(self.keys_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{key}\n" for key, _ in new_rows))
+
+            for offset, (key, _) in enumerate(new_rows):
+                self.index[key] = self.rows + offset
+            self.rows += len(new_rows)
+            self._map(self.rows)
\ No newline at end of file
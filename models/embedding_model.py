@@ -1,3 +1,189 @@
-from langchain_huggingface import HuggingFaceEmbeddings
+import os
+import atexit
+import logging
+import threading
+from collections import OrderedDict
 
-embedding_model = HuggingFaceEmbeddings(model_name='BAAI/bge-large-en-v1.5')
\ No newline at end of file
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from models.embedding_cache import EmbeddingCache
+from models.embedding_backends import build_embeddings
+from models.registry import registry
+from config import (
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_BACKEND,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_NUM_THREADS,
+    EMBEDDING_MAX_SEQ_LENGTH,
+    EMBEDDING_ONNX_EXPORT_DIR,
+    DOCUMENT_EMBEDDING_CACHE_DIR,
+    DOCUMENT_EMBEDDING_CACHE_DTYPE,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    QUERY_EMBEDDING_CACHE_PATH,
+)
+
+
+def normalize_query(text):
+    # "What is HRT?" and "what is  hrt" share a cache entry.
+    return " ".join(text.lower().split()).rstrip("?!. ")
+
+
+class CachedEmbeddings(Embeddings):
+    # Query embeddings go through an in-memory LRU (optionally persisted); document embeddings
+    # go through an on-disk EmbeddingCache so unchanged texts are never re-embedded.
+    def __init__(self, embeddings, max_size=1024, persist_path=None, save_every=100, document_cache=None, model_name=""):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.document_cache = document_cache
+        self.max_size = max_size
+        self.persist_path = persist_path
+        self.save_every = save_every
+
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.unsaved = 0
+
+        self.logger = self.setup_logger()
+
+        if self.persist_path:
+            self.load()
+            atexit.register(self.save)
+
+    def setup_logger(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        return logging.getLogger(__name__)
+
+    def embed_documents(self, texts):
+        if self.document_cache is None:
+            return self.embeddings.embed_documents(texts)
+
+        keys = [self.document_cache.key(text) for text in texts]
+        vectors = self.document_cache.get_many(keys)
+
+        missing = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+
+        if missing:
+            embedded = self.embeddings.embed_documents(list(missing.values()))
+            self.document_cache.put_many(list(missing.keys()), embedded)
+            fresh = dict(zip(missing.keys(), embedded))
+            vectors = [fresh[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+
+        self.logger.info(f"Embedding cache: {len(missing)} new texts embedded for {len(texts)} documents.")
+        return [np.asarray(vector, dtype=np.float32).tolist() for vector in vectors]
+
+    def embed_query(self, text):
+        key = normalize_query(text)
+        with self.lock:
+            vector = self.cache.get(key)
+            if vector is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return vector.tolist()
+            self.misses += 1
+
+        vector = np.asarray(self.embeddings.embed_query(key), dtype=np.float32)
+
+        with self.lock:
+            self.cache[key] = vector
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+            self.unsaved += 1
+            should_save = self.persist_path and self.unsaved >= self.save_every
+
+        if should_save:
+            self.save()
+        return vector.tolist()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self.cache),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+            self.unsaved = 0
+
+    def load(self):
+        if not os.path.isfile(self.persist_path):
+            return
+        try:
+            with np.load(self.persist_path, allow_pickle=False) as data:
+                keys, vectors = data["keys"], data["vectors"]
+                stored_model_name = str(data["model_name"]) if "model_name" in data else ""
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable query embedding cache {self.persist_path}: {e}")
+            return
+
+        if stored_model_name != self.model_name:
+            self.logger.info(f"Discarding query embedding cache built with '{stored_model_name}'.")
+            return
+
+        with self.lock:
+            for key, vector in list(zip(keys.tolist(), vectors))[-self.max_size:]:
+                self.cache[key] = vector
+        self.logger.info(f"Loaded {len(self.cache)} cached query embeddings from {self.persist_path}.")
+
+    def save(self):
+        if not self.persist_path:
+            return
+        with self.lock:
+            if not self.cache:
+                return
+            keys = np.array(list(self.cache.keys()))
+            vectors = np.stack(list(self.cache.values()))
+            self.unsaved = 0
+
+        os.makedirs(os.path.dirname(self.persist_path), exist_ok=True)
+        tmp_path = self.persist_path + ".tmp.npz"
+        np.savez(tmp_path, keys=keys, vectors=vectors, model_name=np.array(self.model_name))
+        os.replace(tmp_path, self.persist_path)
+
+
+class LazyEmbeddings(Embeddings):
+    # Stand-in handed to Chroma so that opening the vector store does not load the model;
+    # the model is built on the first embed call.
+    def embed_documents(self, texts):
+        return get_embedding_model().embed_documents(texts)
+
+    def embed_query(self, text):
+        return get_embedding_model().embed_query(text)
+
+
+def build_embedding_model():
+    # Cached vectors are only reusable for the exact backend and truncation length that produced them.
+    cache_model_name = f"{EMBEDDING_MODEL_NAME}@{EMBEDDING_BACKEND}-{EMBEDDING_MAX_SEQ_LENGTH}"
+
+    return CachedEmbeddings(
+        build_embeddings(
+            EMBEDDING_BACKEND,
+            EMBEDDING_MODEL_NAME,
+            batch_size=EMBEDDING_BATCH_SIZE,
+            num_threads=EMBEDDING_NUM_THREADS,
+            max_seq_length=EMBEDDING_MAX_SEQ_LENGTH,
+            onnx_export_dir=EMBEDDING_ONNX_EXPORT_DIR,
+        ),
+        max_size=QUERY_EMBEDDING_CACHE_SIZE,
+        persist_path=QUERY_EMBEDDING_CACHE_PATH,
+        document_cache=EmbeddingCache(DOCUMENT_EMBEDDING_CACHE_DIR, cache_model_name, dtype=DOCUMENT_EMBEDDING_CACHE_DTYPE),
+        model_name=cache_model_name,
+    )
+
+
+registry.register("embedding_model", build_embedding_model)
+
+
+def get_embedding_model():
+    return registry.get("embedding_model")
\ No newline at end of file
@@ -0,0 +1,81 @@
+import time
+import argparse
+import logging
+
+import numpy as np
+
+from models.embedding_backends import EMBEDDING_BACKENDS, build_embeddings
+from config import EMBEDDING_MODEL_NAME, EMBEDDING_BATCH_SIZE, EMBEDDING_NUM_THREADS, EMBEDDING_MAX_SEQ_LENGTH, EMBEDDING_ONNX_EXPORT_DIR
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def timed_embed(embeddings, texts):
+    start = time.perf_counter()
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    return vectors, time.perf_counter() - start
+
+
+def cosine_drift(candidate_vectors, reference_vectors):
+    candidate = candidate_vectors / np.linalg.norm(candidate_vectors, axis=1, keepdims=True)
+    reference = reference_vectors / np.linalg.norm(reference_vectors, axis=1, keepdims=True)
+    cosine = np.sum(candidate * reference, axis=1)
+    return {
+        "mean_cosine": float(cosine.mean()),
+        "min_cosine": float(cosine.min()),
+        "p01_cosine": float(np.percentile(cosine, 1)),
+        "max_drift": float(1.0 - cosine.min()),
+    }
+
+
+def parity_check(candidate, reference, texts):
+    reference_vectors, reference_seconds = timed_embed(reference, texts)
+    candidate_vectors, candidate_seconds = timed_embed(candidate, texts)
+    report = cosine_drift(candidate_vectors, reference_vectors)
+    report.update({
+        "texts": len(texts),
+        "reference_texts_per_second": len(texts) / reference_seconds,
+        "candidate_texts_per_second": len(texts) / candidate_seconds,
+        "speedup": reference_seconds / candidate_seconds,
+    })
+    return report
+
+
+def sample_texts_from_vectorstore(limit):
+    from models.vectorstore import get_vectorstore
+    return [text for text in get_vectorstore().get(limit=limit, include=["documents"])["documents"] if text]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare an embedding backend against the fp32 reference model.")
+    parser.add_argument("--backend", choices=EMBEDDING_BACKENDS, default="torch-int8")
+    parser.add_argument("--reference-backend", choices=EMBEDDING_BACKENDS, default="torch")
+    parser.add_argument("--texts-file", help="Newline-separated texts; defaults to a sample of the Chroma collection.")
+    parser.add_argument("--limit", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--num-threads", type=int, default=EMBEDDING_NUM_THREADS)
+    parser.add_argument("--max-seq-length", type=int, default=EMBEDDING_MAX_SEQ_LENGTH)
+    args = parser.parse_args()
+
+    if args.texts_file:
+        with open(args.texts_file, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()][:args.limit]
+    else:
+        texts = sample_texts_from_vectorstore(args.limit)
+    if not texts:
+        logger.error("No texts to compare.")
+        return
+
+    options = {"batch_size": args.batch_size, "num_threads": args.num_threads, "max_seq_length": args.max_seq_length,
+               "onnx_export_dir": EMBEDDING_ONNX_EXPORT_DIR}
+    reference = build_embeddings(args.reference_backend, EMBEDDING_MODEL_NAME, **options)
+    candidate = build_embeddings(args.backend, EMBEDDING_MODEL_NAME, **options)
+
+    report = parity_check(candidate, reference, texts)
+    for key, value in report.items():
+        logger.info(f"{key}: {value:.4f}" if isinstance(value, float) else f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
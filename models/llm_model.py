@@ -1,12 +1,26 @@
 import os
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
+from models.registry import registry
+from config import GEMINI_API_ENDPOINT
 
 load_dotenv()
 gemini_api_key = os.getenv("GEMINI_API_KEY")
 
-llm = ChatGoogleGenerativeAI(
-    api_key=gemini_api_key,
-    model="gemini-2.0-flash",
-    temperature=0.3
-)
\ No newline at end of file
+def gemini_client_kwargs(api_endpoint=GEMINI_API_ENDPOINT):
+    if not api_endpoint:
+        return {}
+    return {"client_options": {"api_endpoint": api_endpoint}, "transport": "rest"}
+
+def build_llm():
+    return ChatGoogleGenerativeAI(
+        api_key=gemini_api_key,
+        model="gemini-2.0-flash",
+        temperature=0.3,
+        **gemini_client_kwargs()
+    )
+
+registry.register("llm", build_llm)
+
+def get_llm():
+    return registry.get("llm")
\ No newline at end of file
@@ -95,6 +95,22 @@ Summary:
     input_variables=["table_data", "metadata"]
 )
 
+# Same guidelines as table_summarizer_prompt_template, applied to several tables in one call.
+batched_table_summarizer_prompt_template = PromptTemplate(
+    template=table_summarizer_prompt_template.template.split("Table Data:")[0] + """Batch Instructions:
+You will receive several independent tables, each introduced by a "### Table <number>" header and followed by its own metadata. Summarize every table separately, following all of the guidelines above, and never mix information between tables.
+
+Respond with only a JSON array containing one object per table, in the same order, with no text before or after it:
+[{{"table_id": 1, "summary": "<summary of table 1>"}}, {{"table_id": 2, "summary": "<summary of table 2>"}}]
+
+Tables:
+{tables}
+
+JSON:
+""",
+    input_variables=["tables"]
+)
+
 image_summarizer_prompt_template = PromptTemplate(
     template="""
 System: You are MenoImageSummarizer, an AI assistant specialized in comprehensively summarizing medical research figures for a Retrieval-Augmented Generation (RAG) system focused on menopause-related literature. Your summaries will serve as high-value retrievable content to provide evidence-based answers about menopause-related visual data.
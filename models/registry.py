@@ -0,0 +1,62 @@
+import time
+import logging
+import threading
+
+
+class ResourceRegistry:
+    # Builds each heavy component (models, clients, indexes) the first time it is requested
+    # and hands out the same instance afterwards. Failed builds are not cached.
+    def __init__(self):
+        self.factories = {}
+        self.instances = {}
+        self.build_locks = {}
+        self.lock = threading.Lock()
+        self.logger = self.setup_logger()
+
+    def setup_logger(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        return logging.getLogger(__name__)
+
+    def register(self, name, factory):
+        with self.lock:
+            self.factories[name] = factory
+            self.build_locks.setdefault(name, threading.Lock())
+
+    def is_ready(self, name):
+        return name in self.instances
+
+    def get(self, name):
+        if name in self.instances:
+            return self.instances[name]
+        if name not in self.factories:
+            raise KeyError(f"No resource registered under '{name}'.")
+
+        with self.build_locks[name]:
+            if name not in self.instances:
+                start = time.perf_counter()
+                self.instances[name] = self.factories[name]()
+                self.logger.info(f"Loaded resource '{name}' in {time.perf_counter() - start:.2f}s.")
+        return self.instances[name]
+
+    def reset(self, name):
+        with self.build_locks[name]:
+            self.instances.pop(name, None)
+
+    def _warm(self, name):
+        try:
+            self.get(name)
+        except Exception as e:
+            self.logger.error(f"Warm-up of resource '{name}' failed: {e}")
+
+    def warm_up(self, names=None, background=True):
+        names = list(names or self.factories)
+        threads = [threading.Thread(target=self._warm, args=(name,), name=f"warm-up-{name}", daemon=True) for name in names]
+        for thread in threads:
+            thread.start()
+        if not background:
+            for thread in threads:
+                thread.join()
+        return threads
+
+
+registry = ResourceRegistry()
\ No newline at end of file
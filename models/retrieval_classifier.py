@@ -0,0 +1,100 @@
+import os
+import json
+import time
+import logging
+import threading
+
+import numpy as np
+
+from models.registry import registry
+from config import RETRIEVAL_CLASSIFIER_PATH, RETRIEVAL_DECISION_LOG_PATH
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class RetrievalClassifier:
+    # Logistic regression on the query embedding that predicts whether a query needs retrieval.
+    # Probabilities between lower and upper are treated as unsure, so the caller can fall back to
+    # the LLM; both thresholds are calibrated offline (see models.retrieval_classifier_training).
+    def __init__(self, weights, bias, lower, upper, model_name):
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = float(bias)
+        self.lower = float(lower)
+        self.upper = float(upper)
+        self.model_name = model_name
+
+    def probability(self, embedding):
+        logit = float(np.dot(self.weights, np.asarray(embedding, dtype=np.float32))) + self.bias
+        return 1.0 / (1.0 + np.exp(-logit))
+
+    def predict(self, embedding):
+        # True / False when confident, None otherwise.
+        probability = self.probability(embedding)
+        if probability >= self.upper:
+            return True
+        if probability <= self.lower:
+            return False
+        return None
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            weights=self.weights,
+            bias=self.bias,
+            lower=self.lower,
+            upper=self.upper,
+            model_name=np.array(self.model_name),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["weights"], data["bias"], data["lower"], data["upper"], str(data["model_name"]))
+
+
+_log_lock = threading.Lock()
+
+def log_decision(query, decision, path=RETRIEVAL_DECISION_LOG_PATH):
+    # Appends every LLM retrieval decision; the log is the training set for the local classifier.
+    record = json.dumps({"query": query, "needs_retrieval": decision, "time": time.time()})
+    try:
+        with _log_lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(record + "\n")
+    except OSError as e:
+        logger.warning(f"Could not log retrieval decision: {e}")
+
+def read_decisions(path=RETRIEVAL_DECISION_LOG_PATH):
+    # Latest decision per query.
+    decisions = {}
+    if not os.path.isfile(path):
+        return decisions
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            decisions[record["query"]] = bool(record["needs_retrieval"])
+    return decisions
+
+
+def load_retrieval_classifier(path=RETRIEVAL_CLASSIFIER_PATH):
+    # None until a classifier has been trained; callers then always ask the LLM.
+    if not os.path.isfile(path):
+        logger.info("No trained retrieval classifier found; retrieval decisions will use the LLM.")
+        return None
+    return RetrievalClassifier.load(path)
+
+registry.register("retrieval_classifier", load_retrieval_classifier)
+
+def get_retrieval_classifier():
+    return registry.get("retrieval_classifier")
\ No newline at end of file
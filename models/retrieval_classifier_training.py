@@ -0,0 +1,114 @@
+import argparse
+import logging
+
+import numpy as np
+
+from models.embedding_model import get_embedding_model
+from models.retrieval_classifier import RetrievalClassifier, read_decisions
+from config import RETRIEVAL_CLASSIFIER_PATH, RETRIEVAL_DECISION_LOG_PATH
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def fit_logistic_regression(features, labels, l2=1e-2, learning_rate=0.5, iterations=2000):
+    # Full-batch gradient descent; query embeddings are L2-normalized, so no feature scaling.
+    weights = np.zeros(features.shape[1], dtype=np.float64)
+    bias = 0.0
+    for _ in range(iterations):
+        probabilities = 1.0 / (1.0 + np.exp(-(features @ weights + bias)))
+        error = probabilities - labels
+        weights -= learning_rate * (features.T @ error / len(labels) + l2 * weights)
+        bias -= learning_rate * float(error.mean())
+    return weights, bias
+
+
+def sigmoid(values):
+    return 1.0 / (1.0 + np.exp(-values))
+
+
+def out_of_fold_probabilities(features, labels, folds=5, l2=1e-2, seed=0):
+    # Each example is scored by a model trained on the other folds, so thresholds are calibrated
+    # on every logged decision instead of a small held-out slice.
+    order = np.random.RandomState(seed).permutation(len(labels))
+    probabilities = np.zeros(len(labels), dtype=np.float64)
+    for fold in np.array_split(order, folds):
+        train = np.setdiff1d(order, fold)
+        weights, bias = fit_logistic_regression(features[train], labels[train], l2=l2)
+        probabilities[fold] = sigmoid(features[fold] @ weights + bias)
+    return probabilities
+
+
+def calibrate_thresholds(probabilities, labels, target_precision=0.95, min_support=20):
+    # upper: lowest threshold whose "yes" predictions reach target_precision over at least
+    # min_support examples; lower: highest such threshold for "no". A side that never qualifies
+    # gets an infinite threshold and is always left to the LLM, as is anything in between.
+    upper = np.inf
+    for threshold in np.unique(probabilities):
+        predicted = probabilities >= threshold
+        if predicted.sum() >= min_support and labels[predicted].mean() >= target_precision:
+            upper = float(threshold)
+            break
+    lower = -np.inf
+    for threshold in np.unique(probabilities)[::-1]:
+        predicted = probabilities <= threshold
+        if predicted.sum() >= min_support and (1 - labels[predicted]).mean() >= target_precision:
+            lower = float(threshold)
+            break
+    return min(lower, upper), upper
+
+
+def evaluate(probabilities, labels, lower, upper):
+    decided = (probabilities >= upper) | (probabilities <= lower)
+    predictions = probabilities >= upper
+    coverage = float(decided.mean()) if len(labels) else 0.0
+    accuracy = float((predictions[decided] == labels[decided].astype(bool)).mean()) if decided.any() else 0.0
+    return {"examples": len(labels), "coverage": coverage, "accuracy_when_decided": accuracy}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and calibrate the local retrieval-need classifier from logged LLM decisions.")
+    parser.add_argument("--log-path", default=RETRIEVAL_DECISION_LOG_PATH)
+    parser.add_argument("--output-path", default=RETRIEVAL_CLASSIFIER_PATH)
+    parser.add_argument("--target-precision", type=float, default=0.95)
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--min-examples-per-class", type=int, default=50,
+                        help="Refuse to train unless both answers were logged at least this often.")
+    parser.add_argument("--min-support", type=int, default=20,
+                        help="Examples a threshold must decide before its precision is trusted.")
+    parser.add_argument("--l2", type=float, default=1e-2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    decisions = read_decisions(args.log_path)
+    labels = np.array(list(decisions.values()), dtype=np.float64)
+    positives = int(labels.sum())
+    negatives = len(labels) - positives
+    if min(positives, negatives) < args.min_examples_per_class:
+        logger.error(
+            f"Need at least {args.min_examples_per_class} logged decisions of each answer; "
+            f"found {positives} needing retrieval and {negatives} not. Not saving a classifier."
+        )
+        return
+
+    embeddings = get_embedding_model()
+    features = np.array([embeddings.embed_query(query) for query in decisions], dtype=np.float64)
+
+    probabilities = out_of_fold_probabilities(features, labels, folds=args.folds, l2=args.l2, seed=args.seed)
+    lower, upper = calibrate_thresholds(probabilities, labels, args.target_precision, args.min_support)
+    report = evaluate(probabilities, labels, lower, upper)
+    logger.info(f"Thresholds: no <= {lower:.3f}, yes >= {upper:.3f}")
+    for key, value in report.items():
+        logger.info(f"{key} (cross-validated): {value:.4f}" if isinstance(value, float) else f"{key}: {value}")
+    if not np.isfinite(lower) and not np.isfinite(upper):
+        logger.error(f"No threshold reaches {args.target_precision:.0%} precision over {args.min_support} examples. Not saving a classifier.")
+        return
+
+    weights, bias = fit_logistic_regression(features, labels, l2=args.l2)
+    classifier = RetrievalClassifier(weights, bias, lower, upper, embeddings.model_name)
+    classifier.save(args.output_path)
+    logger.info(f"Saved retrieval classifier to {args.output_path}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,11 +1,16 @@
 from langchain_chroma import Chroma
-from models.embedding_model import embedding_model
+from models.embedding_model import LazyEmbeddings
+from models.registry import registry
 from config import CHROMA_DB_DIR
 
-vectorstore = Chroma(
-    collection_name='menomind',
-    embedding_function=embedding_model,
-    persist_directory=CHROMA_DB_DIR
-)
+def build_vectorstore():
+    return Chroma(
+        collection_name='menomind',
+        embedding_function=LazyEmbeddings(),
+        persist_directory=CHROMA_DB_DIR
+    )
 
-retriever = vectorstore.as_retriever()
\ No newline at end of file
+registry.register("vectorstore", build_vectorstore)
+
+def get_vectorstore():
+    return registry.get("vectorstore")
\ No newline at end of file
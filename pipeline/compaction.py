@@ -0,0 +1,116 @@
+import json
+import hashlib
+import logging
+import argparse
+
+from models.vectorstore import get_vectorstore
+from models.bm25_model import BM25Index
+from models.docstore import get_docstore
+from pipeline.manifest import IngestionManifest
+from config import CHROMA_DB_DIR, SPARSE_INDEX_DIR, PIPELINE_VERSION, INGESTION_MANIFEST_PATH
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def text_key(text):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def source_key(metadata):
+    return json.dumps([metadata.get("source_pdf"), metadata.get("page_number")])
+
+
+def find_duplicates(vectorstore, page_size=1000, id_key="doc_id"):
+    # Older runs wrote every summary twice: directly, with "type" and the source metadata but no
+    # doc_id, and through MultiVectorRetrieverBuilder, with only a doc_id. Re-runs appended more
+    # copies of both. Vectors are grouped by text and then by source PDF and page; copies without
+    # a source PDF are matched to a group with the same text, first to lend their doc_id to a
+    # keeper that lacks one, the rest as plain duplicates. One vector per group is kept,
+    # preferring the one carrying both "type" and doc_id.
+    by_text = {}
+    offset = 0
+    while True:
+        page = vectorstore.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+        if not page["ids"]:
+            break
+        for vector_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+            by_text.setdefault(text_key(text), []).append((vector_id, metadata or {}))
+        offset += len(page["ids"])
+
+    groups = []
+    for members in by_text.values():
+        sourced = {}
+        sourceless = []
+        for member in members:
+            if member[1].get("source_pdf"):
+                sourced.setdefault(source_key(member[1]), []).append(member)
+            else:
+                sourceless.append(member)
+        if not sourced:
+            groups.append(sourceless)
+            continue
+
+        text_groups = list(sourced.values())
+        for group in text_groups:
+            if sourceless and not any(metadata.get(id_key) for _, metadata in group):
+                group.append(sourceless.pop())
+        text_groups[0].extend(sourceless)
+        groups.extend(text_groups)
+
+    removed_ids = []
+    removed_doc_ids = set()
+    kept_doc_ids = set()
+    metadata_updates = {}
+    for members in groups:
+        keeper_id, keeper_metadata = max(members, key=lambda member: ("type" in member[1], bool(member[1].get(id_key))))
+        if not keeper_metadata.get(id_key):
+            donor_doc_id = next((metadata[id_key] for _, metadata in members if metadata.get(id_key)), None)
+            if donor_doc_id:
+                metadata_updates[keeper_id] = {**keeper_metadata, id_key: donor_doc_id}
+        kept_doc_ids.add(metadata_updates.get(keeper_id, keeper_metadata).get(id_key))
+        for vector_id, metadata in members:
+            if vector_id != keeper_id:
+                removed_ids.append(vector_id)
+                removed_doc_ids.add(metadata.get(id_key))
+
+    orphaned_doc_ids = sorted(doc_id for doc_id in removed_doc_ids - kept_doc_ids if doc_id)
+    return removed_ids, orphaned_doc_ids, metadata_updates, offset
+
+
+def compact(dry_run=False, batch_size=5000):
+    vectorstore = get_vectorstore()
+    removed_ids, orphaned_doc_ids, metadata_updates, total = find_duplicates(vectorstore)
+    logger.info(f"Found {len(removed_ids)} duplicate vectors out of {total} in {CHROMA_DB_DIR}.")
+    if dry_run or not removed_ids:
+        return removed_ids
+
+    # Kept copies that lacked a doc_id take over the one from a removed copy, so their docstore
+    # parent stays reachable.
+    if metadata_updates:
+        vectorstore._collection.update(ids=list(metadata_updates), metadatas=list(metadata_updates.values()))
+    for start in range(0, len(removed_ids), batch_size):
+        vectorstore.delete(ids=removed_ids[start:start + batch_size])
+    get_docstore().mdelete(orphaned_doc_ids)
+
+    if BM25Index.exists(SPARSE_INDEX_DIR):
+        BM25Index.load(SPARSE_INDEX_DIR).delete_documents(removed_ids)
+
+    manifest = IngestionManifest(INGESTION_MANIFEST_PATH, PIPELINE_VERSION)
+    manifest.discard_vector_ids(removed_ids)
+    manifest.mark_index_changed()
+    manifest.save()
+
+    logger.info(f"Removed {len(removed_ids)} duplicate vectors and {len(orphaned_doc_ids)} orphaned docstore entries.")
+    return removed_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove duplicate vectors left in the Chroma collection by earlier ingestion runs.")
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many duplicates would be removed.")
+    args = parser.parse_args()
+    compact(dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,56 +1,206 @@
+import os
+import json
 import logging
 
-from pipeline.processing import documents
-from langchain.docstore.document import Document
+from dotenv import load_dotenv
+from huggingface_hub import login
+
+from pipeline.processing import DocumentProcessingPipeline, parent_content, document_id
+from pipeline.manifest import IngestionManifest
 from retriever.multi_vector_retriever import MultiVectorRetrieverBuilder
-from langchain_community.vectorstores.utils import filter_complex_metadata
-from models.vectorstore import vectorstore
+from models.vectorstore import get_vectorstore
+from models.bm25_model import get_bm25_index
+from models.docstore import get_docstore
+from config import SOURCE_PDF_DIR, PIPELINE_VERSION, INGESTION_MANIFEST_PATH, INDEX_BATCH_SIZE
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-logger.info("Initializing vector store...")
 
-logger.info(f"Adding {len(documents)} documents to vector store...")
-vector_docs_for_chroma = []
+def vector_ids_for_sources(vectorstore, file_names):
+    ids = []
+    for file_name in file_names:
+        ids.extend(vectorstore.get(where={"source_pdf": file_name}, include=[])["ids"])
+    return ids
 
-for doc_entry in documents:
-    summary = None
-    metadata = doc_entry['metadata']
-    doc_type = doc_entry['type']
 
+def summary_text(doc_entry):
+    doc_type = doc_entry['type']
     if doc_type == 'text':
-        summary = doc_entry['text_element']
-    elif doc_type == 'table':
-        summary = doc_entry['table_summary']['summary']
-    elif doc_type == 'image':
-        summary = doc_entry['image_summary']['summary']
-
-    vector_docs_for_chroma.append(Document(page_content=summary, metadata={'type': doc_type, **metadata}))
-
-filtered_docs = filter_complex_metadata(vector_docs_for_chroma)
-
-logger.info(f"Adding {len(filtered_docs)} summaries to Chroma.")
-vectorstore.add_documents(filtered_docs)
-logger.info("Documents added to Chroma vector store.")
-
-logger.info("Building multi-vector retriever...")
-
-raw_text_elements = [doc['text_element'] for doc in documents if doc['type'] == 'text']
-raw_table_summaries = [doc['table_summary']['summary'] for doc in documents if doc['type'] == 'table']
-raw_table_elements = [doc['table_element']['text'] for doc in documents if doc['type'] == 'table']
-raw_image_summaries = [doc['image_summary']['summary'] for doc in documents if doc['type'] == 'image']
-raw_img_base64_list = [doc['img_base64'] for doc in documents if doc['type'] == 'image']
-
-builder = MultiVectorRetrieverBuilder(
-    vectorstore=vectorstore,
-    text_elements=raw_text_elements,
-    text_summaries=[],
-    table_summaries=raw_table_summaries,
-    table_elements=raw_table_elements,
-    image_summaries=raw_image_summaries,
-    img_base64_list=raw_img_base64_list,
-)
-
-retriever = builder.create_retriever()
-logger.info("Multi-vector Retriever created successfully.")
\ No newline at end of file
+        return doc_entry['text_element']
+    if doc_type == 'table':
+        return doc_entry['table_summary']['summary']
+    if doc_type == 'image':
+        return doc_entry['image_summary']['summary']
+    return None
+
+
+def index_documents(documents, bm25_index, builder):
+    # Each entry is written once, through the builder, under its deterministic id: the same id is
+    # the Chroma id, the BM25 id and the docstore key. Chroma and BM25 writes are upserts, so
+    # re-indexing unchanged content replaces entries instead of duplicating them.
+    duplicates = [doc_entry for doc_entry in documents if doc_entry['type'] == 'duplicate']
+    unique_entries = {}
+    for doc_entry in documents:
+        if doc_entry['type'] != 'duplicate':
+            unique_entries.setdefault(document_id(doc_entry), doc_entry)
+    entries = list(unique_entries.values())
+    summaries = [summary_text(doc_entry) for doc_entry in entries]
+
+    # add_documents raises on a failed write, which aborts the run before the manifest records
+    # the batch's files, so they are retried next time.
+    added_ids = builder.add_documents(
+        summaries,
+        [parent_content(doc_entry) for doc_entry in entries],
+        [{'type': doc_entry['type'], **doc_entry['metadata']} for doc_entry in entries],
+        ids=list(unique_entries),
+    )
+    if len(added_ids) != len(entries):
+        raise RuntimeError(f"Indexed {len(added_ids)} of {len(entries)} document entries.")
+    if added_ids:
+        bm25_index.upsert_documents(added_ids, summaries, save=False)
+    if duplicates:
+        record_duplicate_sources(builder.vectorstore, duplicates)
+
+
+def record_duplicate_sources(vectorstore, duplicates):
+    # Near-duplicate chunks are not indexed; instead the canonical chunk lists every collapsed
+    # copy's source PDF and page as JSON in its "duplicate_sources" metadata.
+    sources = {}
+    for entry in duplicates:
+        sources.setdefault(entry['duplicate_of'], []).append(entry['metadata'])
+
+    fetched = vectorstore.get(ids=list(sources), include=["metadatas"])
+    updated_ids, updated_metadatas = [], []
+    for canonical_id, metadata in zip(fetched["ids"], fetched["metadatas"]):
+        metadata = metadata or {}
+        recorded = json.loads(metadata.get("duplicate_sources", "[]"))
+        for source in sources[canonical_id]:
+            if source not in recorded:
+                recorded.append(source)
+        updated_ids.append(canonical_id)
+        updated_metadatas.append({**metadata, "duplicate_sources": json.dumps(recorded)})
+
+    if updated_ids:
+        vectorstore._collection.update(ids=updated_ids, metadatas=updated_metadatas)
+
+
+def duplicate_source_files(vectorstore, ids):
+    if not ids:
+        return []
+    metadatas = vectorstore.get(ids=ids, include=["metadatas"])["metadatas"]
+    return sorted({
+        source['source_pdf']
+        for metadata in metadatas if metadata and metadata.get("duplicate_sources")
+        for source in json.loads(metadata["duplicate_sources"])
+    })
+
+
+def plan_stale_vectors(manifest, vectorstore, file_hashes, changed_files, removed_files):
+    # Deleting a canonical chunk would lose the near duplicates collapsed onto it, so PDFs that
+    # contributed such duplicates are re-ingested along with the changed ones.
+    while True:
+        stale_files = changed_files + removed_files
+        stale_ids = sorted(set(manifest.vector_ids(stale_files)) | set(vector_ids_for_sources(vectorstore, stale_files)))
+        dependent_files = [
+            file_name for file_name in duplicate_source_files(vectorstore, stale_ids)
+            if file_name in file_hashes and file_name not in stale_files
+        ]
+        if not dependent_files:
+            return changed_files, stale_files, stale_ids
+        logger.info(f"Re-ingesting {len(dependent_files)} PDFs whose chunks were collapsed onto changed or removed ones.")
+        changed_files = sorted(changed_files + dependent_files)
+
+
+def doc_ids_for_vectors(vectorstore, ids, id_key="doc_id"):
+    if not ids:
+        return []
+    metadatas = vectorstore.get(ids=ids, include=["metadatas"])["metadatas"]
+    return sorted({metadata[id_key] for metadata in metadatas if metadata and metadata.get(id_key)})
+
+
+def document_batches(entries, batch_size):
+    # Groups document entries into batches of at most batch_size and reports, with each batch,
+    # the file_done markers of files whose entries are now all in this or an earlier batch.
+    batch = []
+    finished_files = []
+    for entry in entries:
+        if entry['type'] == 'file_done':
+            finished_files.append(entry)
+            continue
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            yield batch, finished_files
+            batch, finished_files = [], []
+    if batch or finished_files:
+        yield batch, finished_files
+
+
+def run_indexing(pdf_folder=SOURCE_PDF_DIR, batch_size=INDEX_BATCH_SIZE):
+    load_dotenv()
+    login(os.getenv("HF_API_TOKEN"))
+    logger.info("Hugging Face login successful.")
+
+    manifest = IngestionManifest(INGESTION_MANIFEST_PATH, PIPELINE_VERSION)
+    file_hashes, changed_files, removed_files = manifest.plan(pdf_folder)
+
+    logger.info("Initializing vector store...")
+    vectorstore = get_vectorstore()
+    bm25_index = get_bm25_index()
+    docstore = get_docstore()
+
+    changed_files, stale_files, stale_ids = plan_stale_vectors(manifest, vectorstore, file_hashes, changed_files, removed_files)
+    if stale_ids:
+        logger.info(f"Deleting {len(stale_ids)} vectors from {len(stale_files)} changed or removed PDFs.")
+        docstore.mdelete(doc_ids_for_vectors(vectorstore, stale_ids))
+        vectorstore.delete(ids=stale_ids)
+        bm25_index.delete_documents(stale_ids)
+        manifest.mark_index_changed()
+    for file_name in removed_files:
+        manifest.forget(file_name)
+    manifest.save()
+
+    if not changed_files:
+        logger.info("No new or changed PDFs to ingest.")
+        return
+
+    builder = MultiVectorRetrieverBuilder(
+        vectorstore=vectorstore,
+        text_elements=[],
+        text_summaries=[],
+        table_summaries=[],
+        table_elements=[],
+        image_summaries=[],
+        image_digests=[],
+        store=docstore,
+    )
+    retriever = builder.create_retriever()
+
+    pipeline = DocumentProcessingPipeline(pdf_folder)
+    total = 0
+    failed_files = []
+    for batch, finished_files in document_batches(pipeline.iter_documents(changed_files), batch_size):
+        index_documents(batch, bm25_index, builder)
+        bm25_index.save()
+        total += len(batch)
+
+        for finished in finished_files:
+            file_name = finished['file_name']
+            if finished['failed']:
+                # Left out of the manifest so the next run retries it.
+                failed_files.append(file_name)
+                continue
+            manifest.record(file_name, file_hashes[file_name], vector_ids_for_sources(vectorstore, [file_name]))
+        manifest.save()
+        logger.info(f"Indexed {total} document entries so far; {len(finished_files)} PDFs completed in this batch.")
+
+    pipeline.summary_cache.log_stats()
+    pipeline.image_preprocessor.log_stats()
+    if failed_files:
+        logger.warning(f"Extraction failed for {len(failed_files)} PDFs; they will be retried on the next run: {', '.join(failed_files)}")
+    logger.info(f"Ingestion finished: {len(changed_files) - len(failed_files)} PDFs ingested, {len(removed_files)} removed.")
+    return retriever
+
+
+if __name__ == "__main__":
+    run_indexing()
\ No newline at end of file
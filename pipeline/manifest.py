@@ -0,0 +1,91 @@
+import os
+import json
+import logging
+
+from utils.hashing import file_sha256
+
+
+class IngestionManifest:
+    # Tracks, per source PDF, the content hash and pipeline version it was ingested with and
+    # the vector IDs it produced, so a run only has to touch files that were added, changed or removed.
+    # index_generation is bumped by anything that changes the indexes without recording a file
+    # (deleting stale vectors, compaction); the file is only rewritten when its content changes,
+    # so its modification time tracks real index changes.
+    def __init__(self, path, pipeline_version):
+        self.path = path
+        self.pipeline_version = pipeline_version
+        self.entries = {}
+        self.index_generation = 0
+        self.saved_payload = None
+        self.logger = self.setup_logger()
+        self.load()
+
+    def setup_logger(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        return logging.getLogger(__name__)
+
+    def load(self):
+        if os.path.isfile(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.entries = data.get("files", {})
+            self.index_generation = data.get("index_generation", 0)
+            self.saved_payload = self._payload()
+
+    def _payload(self):
+        return json.dumps({"files": self.entries, "index_generation": self.index_generation}, indent=2, sort_keys=True)
+
+    def save(self):
+        payload = self._payload()
+        if payload == self.saved_payload:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, self.path)
+        self.saved_payload = payload
+
+    def mark_index_changed(self):
+        self.index_generation += 1
+
+    def plan(self, pdf_folder):
+        current = {}
+        if os.path.isdir(pdf_folder):
+            for file_name in sorted(os.listdir(pdf_folder)):
+                if file_name.endswith(".pdf"):
+                    current[file_name] = file_sha256(os.path.join(pdf_folder, file_name))
+
+        changed = []
+        for file_name, sha256 in current.items():
+            entry = self.entries.get(file_name)
+            if entry is None or entry["sha256"] != sha256 or entry["pipeline_version"] != self.pipeline_version:
+                changed.append(file_name)
+        removed = sorted(set(self.entries) - set(current))
+
+        self.logger.info(
+            f"Ingestion plan: {len(changed)} new or changed, {len(removed)} removed, "
+            f"{len(current) - len(changed)} unchanged PDFs."
+        )
+        return current, changed, removed
+
+    def vector_ids(self, file_names):
+        ids = []
+        for file_name in file_names:
+            ids.extend(self.entries.get(file_name, {}).get("vector_ids", []))
+        return ids
+
+    def record(self, file_name, sha256, vector_ids):
+        self.entries[file_name] = {
+            "sha256": sha256,
+            "pipeline_version": self.pipeline_version,
+            "vector_ids": list(vector_ids),
+        }
+
+    def forget(self, file_name):
+        self.entries.pop(file_name, None)
+
+    def discard_vector_ids(self, ids):
+        ids = set(ids)
+        for entry in self.entries.values():
+            entry["vector_ids"] = [vector_id for vector_id in entry.get("vector_ids", []) if vector_id not in ids]
\ No newline at end of file
@@ -1,66 +1,240 @@
 import os
+import json
+import uuid
 from dotenv import load_dotenv
-from huggingface_hub import login
 import logging
 
 from processors.pdf_processor import PDFProcessor
+from processors.extraction_cache import ExtractionCache
+from processors.image_preprocessor import ImagePreprocessor
+from processors.near_duplicates import NearDuplicateDetector
 from utils.text_splitter import TextSplitter
 from summarizers.table_summarizer import TableSummarizer
 from summarizers.image_summarizer import ImageSummarizer
+from summarizers.async_engine import AsyncSummarizationEngine
+from summarizers.rate_limiter import TokenBucketRateLimiter
+from summarizers.summary_cache import SummaryCache
+from pipeline.streaming import run_stages
+from utils.blob_store import BlobStore
 
-from config import SOURCE_PDF_DIR
+from config import (
+    SOURCE_PDF_DIR,
+    PDF_WORKERS,
+    PDF_SHARD_MIN_PAGES,
+    PDF_PAGES_PER_SHARD,
+    EXTRACTION_CACHE_DIR,
+    BLOB_STORE_DIR,
+    SUMMARY_CACHE_PATH,
+    PIPELINE_QUEUE_SIZE,
+    SUMMARIZER_REQUESTS_PER_MINUTE,
+    SUMMARIZER_TOKENS_PER_MINUTE,
+    SUMMARIZER_MAX_CONCURRENCY,
+    SUMMARIZER_MAX_RETRIES,
+    TABLE_BATCH_TOKEN_BUDGET,
+    TABLE_BATCH_MAX_TABLES,
+    TABLE_BATCH_OUTPUT_TOKEN_BUDGET,
+    TABLE_SUMMARY_OUTPUT_TOKENS,
+    IMAGE_MIN_SIZE,
+    IMAGE_MAX_RESOLUTION,
+    IMAGE_JPEG_QUALITY,
+    IMAGE_DUPLICATE_HASH_DISTANCE,
+    NEAR_DUPLICATE_THRESHOLD,
+    NEAR_DUPLICATE_NUM_PERM,
+    NEAR_DUPLICATE_SHINGLE_SIZE,
+)
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 load_dotenv()
 gemini_api_key = os.getenv("GEMINI_API_KEY")
-hf_api_token = os.getenv("HF_API_TOKEN")
-
-login(hf_api_token)
-logger.info("Hugging Face login successful.")
-
-logger.info(f"Starting PDF processing from: {SOURCE_PDF_DIR}")
-pdf_processor = PDFProcessor(SOURCE_PDF_DIR)
-text_elements, table_elements, images_elements = pdf_processor.process_pdfs()
-
-logger.info("Splitting text elements...")
-text_splitter = TextSplitter()
-text_chunks = text_splitter.enforce_token_size(text_elements)
-
-logger.info("Summarizing table elements...")
-table_summarizer = TableSummarizer(gemini_api_key)
-table_summaries = table_summarizer.summarize_tables(table_elements)
-
-logger.info("Summarizing image elements...")
-image_summarizer = ImageSummarizer(gemini_api_key)
-image_summaries, img_base64_list = image_summarizer.summarize_images(images_elements)
-
-logger.info("Document processing completed.")
-
-documents = []
-
-for text_chunk in text_chunks:
-    documents.append({
-        'type': 'text',
-        'text_element': text_chunk.page_content,
-        'metadata': text_chunk.metadata 
-    })
-
-for table_summary_entry, table_element_entry in zip(table_summaries, table_elements):
-    documents.append({
-        'type': 'table',
-        'table_summary': table_summary_entry,
-        'table_element': table_element_entry['content'], 
-        'metadata': table_element_entry['metadata'] 
-    })
-
-for image_summary_entry, img_base64_string in zip(image_summaries, img_base64_list):
-    documents.append({
-        'type': 'image',
-        'image_summary': image_summary_entry,
-        'img_base64': img_base64_string,
-        'metadata': image_summary_entry['metadata']
-    })
-
-logger.info(f"Processed {len(documents)} total document entries.")
+
+DOCUMENT_ID_NAMESPACE = uuid.UUID("6f0c1a52-3c1e-4b5e-9d7a-2f4e8b9c0d13")
+
+
+def build_document_entries(text_chunks, table_elements, table_summaries, image_summaries, image_digests):
+    documents = []
+
+    for text_chunk in text_chunks:
+        documents.append({
+            'type': 'text',
+            'text_element': text_chunk.page_content,
+            'metadata': text_chunk.metadata
+        })
+
+    for table_summary_entry, table_element_entry in zip(table_summaries, table_elements):
+        documents.append({
+            'type': 'table',
+            'table_summary': table_summary_entry,
+            'table_element': table_element_entry['content'],
+            'metadata': table_element_entry['metadata']
+        })
+
+    for image_summary_entry, image_digest in zip(image_summaries, image_digests):
+        documents.append({
+            'type': 'image',
+            'image_summary': image_summary_entry,
+            'image_digest': image_digest,
+            'metadata': image_summary_entry['metadata']
+        })
+
+    return documents
+
+
+def parent_content(doc_entry):
+    doc_type = doc_entry['type']
+    if doc_type == 'text':
+        return doc_entry['text_element']
+    if doc_type == 'table':
+        return doc_entry['table_element']['text']
+    if doc_type == 'image':
+        return doc_entry['image_digest']
+    return None
+
+
+def document_id(doc_entry):
+    # Derived from the entry's source and content, so the same entry always maps to the same id.
+    metadata = doc_entry['metadata']
+    key = json.dumps([doc_entry['type'], metadata.get('source_pdf'), metadata.get('page_number'), parent_content(doc_entry)])
+    return str(uuid.uuid5(DOCUMENT_ID_NAMESPACE, key))
+
+
+class DocumentProcessingPipeline:
+    # PDF -> split -> summarize -> document entries, one PDF at a time. Each step runs on its own
+    # thread behind a bounded queue, so at most a few PDFs' worth of elements are in memory.
+    def __init__(self, pdf_folder=SOURCE_PDF_DIR, queue_size=PIPELINE_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.blob_store = BlobStore(BLOB_STORE_DIR)
+        self.pdf_processor = PDFProcessor(
+            pdf_folder,
+            workers=PDF_WORKERS,
+            shard_min_pages=PDF_SHARD_MIN_PAGES,
+            pages_per_shard=PDF_PAGES_PER_SHARD,
+            cache=ExtractionCache(EXTRACTION_CACHE_DIR),
+            blob_store=self.blob_store,
+        )
+        self.text_splitter = TextSplitter()
+        self.near_duplicates = NearDuplicateDetector(
+            threshold=NEAR_DUPLICATE_THRESHOLD,
+            num_perm=NEAR_DUPLICATE_NUM_PERM,
+            shingle_size=NEAR_DUPLICATE_SHINGLE_SIZE,
+        ) if NEAR_DUPLICATE_THRESHOLD else None
+        self.summarization_engine = AsyncSummarizationEngine(
+            TokenBucketRateLimiter(SUMMARIZER_REQUESTS_PER_MINUTE, SUMMARIZER_TOKENS_PER_MINUTE),
+            max_concurrency=SUMMARIZER_MAX_CONCURRENCY,
+            max_retries=SUMMARIZER_MAX_RETRIES,
+        )
+        self.summary_cache = SummaryCache(SUMMARY_CACHE_PATH)
+        self.table_summarizer = TableSummarizer(
+            gemini_api_key,
+            engine=self.summarization_engine,
+            cache=self.summary_cache,
+            batch_token_budget=TABLE_BATCH_TOKEN_BUDGET,
+            max_batch_size=TABLE_BATCH_MAX_TABLES,
+            batch_output_budget=TABLE_BATCH_OUTPUT_TOKEN_BUDGET,
+            summary_output_tokens=TABLE_SUMMARY_OUTPUT_TOKENS,
+        )
+        self.image_preprocessor = ImagePreprocessor(
+            self.blob_store,
+            min_size=IMAGE_MIN_SIZE,
+            max_resolution=IMAGE_MAX_RESOLUTION,
+            jpeg_quality=IMAGE_JPEG_QUALITY,
+            hash_distance=IMAGE_DUPLICATE_HASH_DISTANCE,
+        )
+        self.image_summarizer = ImageSummarizer(
+            gemini_api_key,
+            engine=self.summarization_engine,
+            cache=self.summary_cache,
+            blob_store=self.blob_store,
+        )
+
+    def split(self, bundle):
+        logger.info(f"Splitting text elements of {bundle['file_name']}...")
+        bundle['text_chunks'] = self.text_splitter.enforce_token_size(bundle.pop('text_elements'))
+        yield bundle
+
+    def deduplicate(self, bundle):
+        # Near-duplicate text chunks (within this PDF or any earlier PDF of the run) are dropped
+        # and emitted as 'duplicate' entries pointing at the canonical chunk's document id, so the
+        # indexer can record their provenance on it.
+        bundle['duplicates'] = []
+        if self.near_duplicates is None:
+            yield bundle
+            return
+
+        kept_chunks = []
+        for chunk in bundle['text_chunks']:
+            chunk_id = document_id({'type': 'text', 'text_element': chunk.page_content, 'metadata': chunk.metadata})
+            canonical_id = self.near_duplicates.check(chunk_id, chunk.page_content)
+            if canonical_id is None or canonical_id == chunk_id:
+                kept_chunks.append(chunk)
+                continue
+            bundle['duplicates'].append({
+                'type': 'duplicate',
+                'duplicate_of': canonical_id,
+                'metadata': {'source_pdf': chunk.metadata.get('source_pdf'), 'page_number': chunk.metadata.get('page_number')},
+            })
+
+        if bundle['duplicates']:
+            logger.info(f"Collapsed {len(bundle['duplicates'])} near-duplicate text chunks of {bundle['file_name']}.")
+        bundle['text_chunks'] = kept_chunks
+        yield bundle
+
+    def summarize(self, bundle):
+        logger.info(f"Summarizing tables and images of {bundle['file_name']}...")
+        # Tables and images go through the shared engine together so their requests overlap.
+        table_jobs = self.table_summarizer.table_jobs(bundle['table_elements'])
+        prepared_images = self.image_preprocessor.prepare(bundle.pop('image_elements'))
+        pending_images = [item for item in prepared_images if item['summary'] is None]
+        image_jobs = self.image_summarizer.image_jobs([item['entry'] for item in pending_images])
+        summaries = self.summarization_engine.run_sync(table_jobs + image_jobs)
+
+        table_count = len(bundle['table_elements'])
+        bundle['table_summaries'] = summaries[:table_count]
+        for item, image_summary in zip(pending_images, summaries[table_count:]):
+            item['summary'] = image_summary['summary']
+        self.image_preprocessor.remember(prepared_images, [item['summary'] for item in prepared_images])
+        bundle['image_summaries'] = [
+            {'summary': item['summary'], 'metadata': item['entry']['metadata']} for item in prepared_images
+        ]
+        bundle['image_digests'] = [item['entry']['content'] for item in prepared_images]
+        yield bundle
+
+    def to_documents(self, bundle):
+        documents = build_document_entries(
+            bundle['text_chunks'],
+            bundle['table_elements'],
+            bundle['table_summaries'],
+            bundle['image_summaries'],
+            bundle['image_digests'],
+        )
+        logger.info(f"Processed {len(documents)} document entries from {bundle['file_name']}.")
+        yield from documents
+        yield from bundle['duplicates']
+        # Marks that every entry of this file has been emitted, so the consumer can record it;
+        # a failed extraction is flagged so the file is retried instead.
+        yield {'type': 'file_done', 'file_name': bundle['file_name'], 'failed': bundle['failed']}
+
+    def extracted_bundles(self, file_names):
+        for file_name, result in self.pdf_processor.iter_pdfs(file_names):
+            text_elements, table_elements, image_elements = result if result is not None else ([], [], [])
+            yield {
+                'file_name': file_name,
+                'failed': result is None,
+                'text_elements': text_elements,
+                'table_elements': table_elements,
+                'image_elements': image_elements,
+            }
+
+    def iter_documents(self, file_names=None):
+        logger.info(f"Starting PDF processing from: {self.pdf_processor.pdf_folder}")
+        return run_stages(
+            self.extracted_bundles(file_names),
+            [
+                ("split", self.split),
+                ("deduplicate", self.deduplicate),
+                ("summarize", self.summarize),
+                ("documents", self.to_documents),
+            ],
+            queue_size=self.queue_size,
+        )
\ No newline at end of file
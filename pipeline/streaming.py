@@ -0,0 +1,87 @@
+import queue
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class _StageFailure:
+    def __init__(self, stage_name, error):
+        self.stage_name = stage_name
+        self.error = error
+
+
+def _put(target, item, stop):
+    # Blocks while the downstream queue is full (backpressure), but gives up once the
+    # pipeline is being torn down so no thread is left waiting forever.
+    while not stop.is_set():
+        try:
+            target.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _feed(source, target, stop):
+    try:
+        for item in source:
+            if not _put(target, item, stop):
+                return
+        _put(target, _END, stop)
+    except Exception as e:
+        logger.error(f"Pipeline source failed: {e}")
+        _put(target, _StageFailure("source", e), stop)
+
+
+def _run_stage(name, fn, source, target, stop):
+    while not stop.is_set():
+        try:
+            item = source.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if item is _END or isinstance(item, _StageFailure):
+            _put(target, item, stop)
+            return
+        try:
+            for result in fn(item):
+                if not _put(target, result, stop):
+                    return
+        except Exception as e:
+            logger.error(f"Pipeline stage '{name}' failed: {e}")
+            _put(target, _StageFailure(name, e), stop)
+            return
+
+
+def run_stages(source, stages, queue_size=2):
+    # Runs source -> stage 1 -> ... -> stage N with every step on its own thread, connected by
+    # queues of at most queue_size items, and yields the last stage's outputs. A slow consumer
+    # stalls the stages upstream of it instead of letting intermediate results pile up.
+    # stages is a list of (name, fn) where fn maps one item to an iterable of output items.
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    stop = threading.Event()
+    threads = [threading.Thread(target=_feed, args=(source, queues[0], stop), name="pipeline-source", daemon=True)]
+    for position, (name, fn) in enumerate(stages):
+        threads.append(threading.Thread(
+            target=_run_stage,
+            args=(name, fn, queues[position], queues[position + 1], stop),
+            name=f"pipeline-{name}",
+            daemon=True,
+        ))
+
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = queues[-1].get()
+            if item is _END:
+                return
+            if isinstance(item, _StageFailure):
+                raise RuntimeError(f"Pipeline stage '{item.stage_name}' failed") from item.error
+            yield item
+    finally:
+        stop.set()
+
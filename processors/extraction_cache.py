@@ -0,0 +1,58 @@
+import os
+import gzip
+import json
+import hashlib
+import logging
+
+
+class ExtractionCache:
+    # One gzip'd JSON file per (PDF content hash, extraction parameters) holding the text, table
+    # and image entries produced by PDFProcessor. Image payloads live in the blob store and the
+    # entries only reference them by digest, so cached files stay small.
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.entries_dir = os.path.join(cache_dir, "entries")
+        self.hits = 0
+        self.misses = 0
+        self.logger = self.setup_logger()
+
+        os.makedirs(self.entries_dir, exist_ok=True)
+
+    def setup_logger(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        return logging.getLogger(__name__)
+
+    def key(self, file_sha256, params):
+        payload = json.dumps({"file": file_sha256, "params": params}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.entries_dir, f"{key}.json.gz")
+
+    def get(self, key):
+        path = self._entry_path(key)
+        if not os.path.isfile(path):
+            self.misses += 1
+            return None
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                payload = json.load(f)
+            result = (payload["text"], payload["tables"], payload["images"])
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable extraction cache entry {path}: {e}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def put(self, key, text_elements, table_elements, image_elements):
+        payload = {
+            "text": text_elements,
+            "tables": table_elements,
+            "images": image_elements,
+        }
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
\ No newline at end of file
@@ -0,0 +1,125 @@
+import io
+import logging
+
+import numpy as np
+from PIL import Image
+
+
+def difference_hash(image, hash_size=8):
+    # 64-bit dHash: compares neighbouring pixels of a small grayscale thumbnail, so re-encoded or
+    # slightly rescaled copies of the same picture land within a few bits of each other.
+    pixels = np.asarray(image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class ImagePreprocessor:
+    # Runs before image summarization: drops images that are too small to carry content, collapses
+    # exact and perceptual duplicates (logos, licence badges, banners) onto one summary, and
+    # downscales/recompresses what is left so less is uploaded. Summaries of images seen earlier in
+    # the run are remembered, so a repeat in a later PDF reuses them instead of calling the model.
+    # Image entries carry blob store digests; processed versions are written back as new blobs.
+    def __init__(self, blob_store, min_size=64, max_resolution=1024, jpeg_quality=85, hash_distance=4):
+        self.blob_store = blob_store
+        self.min_size = min_size
+        self.max_resolution = max_resolution
+        self.jpeg_quality = jpeg_quality
+        self.hash_distance = hash_distance
+        self.known_digests = {}
+        self.known_hashes = []
+        self.stats = {"small": 0, "duplicates": 0, "reused": 0, "resized": 0}
+        self.logger = self.setup_logger()
+
+    def setup_logger(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        return logging.getLogger(__name__)
+
+    def decode(self, digest):
+        data = self.blob_store.read(digest)
+        image = Image.open(io.BytesIO(data))
+        image.load()
+        return data, image
+
+    def encode(self, image, data, digest):
+        # Returns the digest of the payload to upload: the original unless a downscaled or
+        # recompressed version is smaller.
+        resized = max(image.size) > self.max_resolution
+        if resized:
+            image = image.copy()
+            image.thumbnail((self.max_resolution, self.max_resolution), Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        if image.mode in ("RGBA", "LA", "P"):
+            image.save(buffer, format="PNG", optimize=True)
+        else:
+            image.convert("RGB").save(buffer, format="JPEG", quality=self.jpeg_quality, optimize=True)
+        encoded = buffer.getvalue()
+
+        if resized or len(encoded) < len(data):
+            self.stats["resized"] += resized
+            return self.blob_store.put(encoded)
+        return digest
+
+    def _match(self, digest, image_hash, candidates):
+        if digest in candidates["digests"]:
+            return candidates["digests"][digest]
+        for known_hash, value in candidates["hashes"]:
+            if hamming_distance(known_hash, image_hash) <= self.hash_distance:
+                return value
+        return None
+
+    def prepare(self, image_entries):
+        # Returns one item per image to index: {"entry", "digest", "hash", "summary"}, where
+        # "summary" is a reused summary or None when the image still needs one.
+        prepared = []
+        batch = {"digests": {}, "hashes": []}
+        known = {"digests": self.known_digests, "hashes": self.known_hashes}
+
+        for entry in image_entries:
+            try:
+                digest = entry["content"]
+                data, image = self.decode(digest)
+            except Exception as e:
+                self.logger.warning(f"Skipping undecodable image from {entry['metadata'].get('source_pdf')}: {e}")
+                continue
+
+            if min(image.size) < self.min_size:
+                self.stats["small"] += 1
+                continue
+
+            image_hash = difference_hash(image)
+            if self._match(digest, image_hash, batch) is not None:
+                self.stats["duplicates"] += 1
+                continue
+
+            summary = self._match(digest, image_hash, known)
+            if summary is not None:
+                self.stats["reused"] += 1
+
+            item = {
+                "entry": {"content": self.encode(image, data, digest), "metadata": entry["metadata"]},
+                "digest": digest,
+                "hash": image_hash,
+                "summary": summary,
+            }
+            batch["digests"][digest] = item
+            batch["hashes"].append((image_hash, item))
+            prepared.append(item)
+
+        return prepared
+
+    def remember(self, prepared, summaries):
+        for item, summary in zip(prepared, summaries):
+            if item["digest"] not in self.known_digests:
+                self.known_digests[item["digest"]] = summary
+                self.known_hashes.append((item["hash"], summary))
+
+    def log_stats(self):
+        self.logger.info(
+            f"Image preprocessing: {self.stats['small']} too small, {self.stats['duplicates']} duplicates dropped, "
+            f"{self.stats['reused']} summaries reused, {self.stats['resized']} downscaled."
+        )
\ No newline at end of file
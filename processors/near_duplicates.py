@@ -0,0 +1,92 @@
+import re
+import zlib
+import logging
+
+import numpy as np
+
+HASH_PRIME = 4294967311  # smallest prime above 2**32
+
+
+def shingles(text, size=5):
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def lsh_parameters(num_perm, threshold):
+    # Picks bands x rows (bands * rows <= num_perm) whose S-curve midpoint, (1 / bands) ** (1 / rows),
+    # is closest to the requested similarity threshold.
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        midpoint = (1 / bands) ** (1 / rows)
+        if best is None or abs(midpoint - threshold) < best[0]:
+            best = (abs(midpoint - threshold), bands, rows)
+    return best[1], best[2]
+
+
+class NearDuplicateDetector:
+    # MinHash signatures over word shingles, bucketed with LSH. A text is a near duplicate of an
+    # earlier one when they share a band bucket and their estimated Jaccard similarity is at least
+    # threshold; the earlier text is the canonical copy. State lives for the detector's lifetime,
+    # so one detector spans every PDF of an ingestion run.
+    def __init__(self, threshold=0.85, num_perm=128, shingle_size=5, seed=1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = lsh_parameters(num_perm, threshold)
+
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+        self.buckets = [{} for _ in range(self.bands)]
+        self.signatures = {}
+        self.duplicates = 0
+        self.logger = self.setup_logger()
+
+    def setup_logger(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        return logging.getLogger(__name__)
+
+    def signature(self, text):
+        hashed = np.array([zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(text, self.shingle_size)], dtype=np.uint64)
+        if hashed.size == 0:
+            return None
+        return ((hashed[:, None] * self.a[None, :] + self.b[None, :]) % HASH_PRIME).min(axis=0)
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def find(self, signature):
+        best_key, best_similarity = None, self.threshold
+        seen = set()
+        for band, band_key in self._band_keys(signature):
+            for candidate in self.buckets[band].get(band_key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                similarity = float(np.mean(self.signatures[candidate] == signature))
+                if similarity >= best_similarity:
+                    best_key, best_similarity = candidate, similarity
+        return best_key
+
+    def add(self, key, signature):
+        self.signatures[key] = signature
+        for band, band_key in self._band_keys(signature):
+            self.buckets[band].setdefault(band_key, []).append(key)
+
+    def check(self, key, text):
+        # Returns the key of the canonical copy when text near-duplicates an earlier one; otherwise
+        # indexes text under key and returns None.
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        canonical = self.find(signature)
+        if canonical is not None:
+            self.duplicates += 1
+            return canonical
+        self.add(key, signature)
+        return None
\ No newline at end of file
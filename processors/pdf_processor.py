@@ -1,42 +1,181 @@
 import os
 import json
 import logging
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from pypdf import PdfReader, PdfWriter
 from unstructured.partition.pdf import partition_pdf
+from unstructured.chunking.title import chunk_by_title
 from unstructured.documents.elements import CompositeElement, Element
+from utils.hashing import file_sha256
 
 os.environ["TABLE_IMAGE_CROP_PAD"] = "1"
 os.environ["EXTRACT_IMAGE_BLOCK_CROP_HORIZONTAL_PAD"] = "20"
 os.environ["EXTRACT_IMAGE_BLOCK_CROP_VERTICAL_PAD"] = "10"
 
+# Part of the extraction cache key; bump when element post-processing below changes its output.
+EXTRACTION_VERSION = 2
+CROP_ENV_VARS = ("TABLE_IMAGE_CROP_PAD", "EXTRACT_IMAGE_BLOCK_CROP_HORIZONTAL_PAD", "EXTRACT_IMAGE_BLOCK_CROP_VERTICAL_PAD")
+
+_worker_processor = None
+
+def _init_worker(pdf_folder, partition_kwargs, chunking_kwargs):
+    # Runs once per pool process: the layout model is loaded here and reused for every file.
+    global _worker_processor
+    _worker_processor = PDFProcessor(pdf_folder)
+    _worker_processor.partition_kwargs = partition_kwargs
+    _worker_processor.chunking_kwargs = chunking_kwargs
+    _worker_processor.warm_up_models()
+
+def _partition_in_worker(pdf_path, page_range):
+    return _worker_processor.partition(pdf_path, page_range)
+
+def _mp_context():
+    return multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+
 class PDFProcessor:
-    def __init__(self, pdf_folder):
+    def __init__(self, pdf_folder, workers=1, shard_min_pages=40, pages_per_shard=10, cache=None, blob_store=None):
         self.pdf_folder = pdf_folder
+        self.cache = cache
+        # With a blob store, image payloads are written to it and entries carry only their digest.
+        self.blob_store = blob_store
+        self.workers = max(1, workers or 1)
+        self.shard_min_pages = shard_min_pages
+        self.pages_per_shard = pages_per_shard
+        self.partition_kwargs = {
+            "strategy": "hi_res",
+            "languages": ["eng"],
+            "infer_table_structure": True,
+            "extract_images_in_pdf": True,
+            "extract_image_block_types": ["Image", "Table"],
+            "extract_image_block_to_payload": True,
+        }
+        self.chunking_kwargs = {
+            "max_characters": 1500,
+            "new_after_n_chars": 1000,
+            "combine_text_under_n_chars": 500,
+        }
         self.logger = self.setup_logger()
 
     def setup_logger(self):
         logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
         return logging.getLogger(__name__)
 
-    def extract_pdf_elements(self, pdf_path):
-        self.logger.info(f"Starting extraction for {pdf_path}")
+    def warm_up_models(self):
+        try:
+            from unstructured_inference.models.base import get_model
+            get_model()
+        except Exception as e:
+            self.logger.warning(f"Could not preload layout model: {e}")
+
+    def page_ranges(self, pdf_path):
+        # [None] means "partition the whole file"; otherwise a list of [start, end) page ranges.
+        # Sharding only pays off when the shards can run on other processes.
+        if self.workers <= 1:
+            return [None]
         try:
-            elements = partition_pdf(
-                filename=pdf_path,
-                strategy="hi_res",
-                languages=["eng"],
-                infer_table_structure=True,
-                extract_images_in_pdf=True,
-                extract_image_block_types=["Image", "Table"],
-                extract_image_block_to_payload=True,
-                chunking_strategy="by_title",
-                max_characters=1500,
-                new_after_n_chars=1000,
-                combine_text_under_n_chars=500
+            page_count = len(PdfReader(pdf_path).pages)
+        except Exception as e:
+            self.logger.warning(f"Could not count pages of {pdf_path}, extracting it unsharded: {e}")
+            return [None]
+        if page_count < self.shard_min_pages:
+            return [None]
+        return [(start, min(start + self.pages_per_shard, page_count)) for start in range(0, page_count, self.pages_per_shard)]
+
+    def partition(self, pdf_path, page_range=None):
+        if page_range is None:
+            return partition_pdf(filename=pdf_path, chunking_strategy="by_title", **self.partition_kwargs, **self.chunking_kwargs)
+
+        # Shards are partitioned without chunking; stitch() chunks the reassembled element list so
+        # by_title boundaries match an unsharded run. Page numbers and filename point at the original.
+        start, end = page_range
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            shard_path = os.path.join(tmp_dir, os.path.basename(pdf_path))
+            reader = PdfReader(pdf_path)
+            writer = PdfWriter()
+            for page_index in range(start, end):
+                writer.add_page(reader.pages[page_index])
+            with open(shard_path, "wb") as f:
+                writer.write(f)
+            return partition_pdf(
+                filename=shard_path,
+                metadata_filename=pdf_path,
+                starting_page_number=start + 1,
+                **self.partition_kwargs,
             )
+
+    def stitch(self, shard_elements):
+        elements = [element for shard in shard_elements for element in shard]
+        return chunk_by_title(elements, **self.chunking_kwargs)
+
+    def _worker_initargs(self):
+        return (self.pdf_folder, self.partition_kwargs, self.chunking_kwargs)
+
+    def _partition_shards(self, pdf_path, ranges):
+        self.logger.info(f"Partitioning {pdf_path} as {len(ranges)} page-range shards.")
+        workers = min(self.workers, len(ranges))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context(), initializer=_init_worker, initargs=self._worker_initargs()) as pool:
+            return list(pool.map(_partition_in_worker, [pdf_path] * len(ranges), ranges))
+
+    def extraction_params(self):
+        import unstructured
+        return {
+            "version": EXTRACTION_VERSION,
+            "unstructured": getattr(unstructured, "__version__", None),
+            "partition": self.partition_kwargs,
+            "chunking": self.chunking_kwargs,
+            "env": {name: os.environ.get(name) for name in CROP_ENV_VARS},
+            "image_payload": "digest" if self.blob_store is not None else "base64",
+        }
+
+    def _cache_key(self, pdf_path):
+        if self.cache is None:
+            return None
+        return self.cache.key(file_sha256(pdf_path), self.extraction_params())
+
+    def _cache_get(self, cache_key, pdf_path):
+        if cache_key is None:
+            return None
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            self.logger.info(f"Using cached extraction for {pdf_path}")
+        return cached
+
+    def _cache_put(self, cache_key, result):
+        if cache_key is None:
+            return
+        try:
+            self.cache.put(cache_key, *result)
+        except Exception as e:
+            self.logger.warning(f"Could not write extraction cache entry: {e}")
+
+    def extract_pdf_elements(self, pdf_path):
+        try:
+            return self._extract(pdf_path)
         except Exception as e:
             self.logger.error(f"Error extracting from {pdf_path}: {e}")
             return [], [], []
 
+    def _extract(self, pdf_path):
+        cache_key = self._cache_key(pdf_path)
+        cached = self._cache_get(cache_key, pdf_path)
+        if cached is not None:
+            return cached
+
+        self.logger.info(f"Starting extraction for {pdf_path}")
+        ranges = self.page_ranges(pdf_path)
+        if ranges == [None]:
+            elements = self.partition(pdf_path)
+        else:
+            elements = self.stitch(self._partition_shards(pdf_path, ranges))
+
+        result = self.elements_to_entries(elements, pdf_path)
+        self._cache_put(cache_key, result)
+        self.logger.info(f"Extraction completed for {pdf_path}")
+        return result
+
+    def elements_to_entries(self, elements, pdf_path):
         text_elements = []
         table_elements = []
         image_elements = []
@@ -51,8 +190,6 @@ class PDFProcessor:
             else:
                 self._process_element(element, pdf_path, text_elements, table_elements, image_elements)
 
-
-        self.logger.info(f"Extraction completed for {pdf_path}")
         return text_elements, table_elements, image_elements
 
     def _process_element(self, element: Element, pdf_path, text_list, table_list, image_list):
@@ -60,6 +197,8 @@ class PDFProcessor:
         raw_metadata["source_pdf"] = os.path.basename(pdf_path)
         raw_metadata["page_number"] = element.metadata.page_number if element.metadata and hasattr(element.metadata, 'page_number') else None
         metadata = self.serialize_metadata(raw_metadata)
+        if self.blob_store is not None and metadata.get("image_base64"):
+            metadata["image_digest"] = self.blob_store.put_base64(metadata.pop("image_base64"))
 
         category = getattr(element, 'category', None)
 
@@ -74,7 +213,7 @@ class PDFProcessor:
         elif category == "Image":
             if hasattr(element.metadata, "image_base64") and element.metadata.image_base64 is not None:
                 image_entry = {
-                    "content": element.metadata.image_base64,
+                    "content": metadata["image_digest"] if self.blob_store is not None else element.metadata.image_base64,
                     "metadata": metadata,
                 }
                 image_list.append(image_entry)
@@ -99,27 +238,110 @@ class PDFProcessor:
         return clean_metadata
 
 
-    def process_pdfs(self):
+    def _pdf_file_names(self, file_names=None):
+        if file_names is None:
+            file_names = os.listdir(self.pdf_folder)
+        return sorted(file_name for file_name in file_names if file_name.endswith(".pdf"))
+
+    def _iter_serial(self, file_names):
+        for file_name in file_names:
+            self.logger.info(f"Processing {file_name}")
+            try:
+                yield file_name, self._extract(os.path.join(self.pdf_folder, file_name))
+            except Exception as e:
+                self.logger.error(f"Skipping {file_name} due to error: {e}")
+                yield file_name, None
+
+    def _iter_parallel(self, file_names):
+        # Every file (or page-range shard of a large file) is one pool task. Files complete in
+        # any order; results are buffered and released in file-name order so the output is
+        # identical to a serial run. Files are submitted at most max_in_flight ahead of the next
+        # one to be yielded, so finished extractions waiting on a slow consumer stay bounded.
+        self.logger.info(f"Extracting {len(file_names)} PDFs with {self.workers} worker processes.")
+        max_in_flight = 2 * self.workers
+
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=_mp_context(), initializer=_init_worker, initargs=self._worker_initargs()) as pool:
+            futures = {}
+            shards = {}
+            remaining = {}
+            failed = set()
+            cache_keys = {}
+            completed = {}
+            next_submit = 0
+            next_position = 0
+
+            while next_position < len(file_names):
+                while next_submit < len(file_names) and next_submit - next_position < max_in_flight:
+                    position = next_submit
+                    next_submit += 1
+                    pdf_path = os.path.join(self.pdf_folder, file_names[position])
+                    cache_keys[position] = self._cache_key(pdf_path)
+                    cached = self._cache_get(cache_keys[position], pdf_path)
+                    if cached is not None:
+                        completed[position] = cached
+                        continue
+
+                    ranges = self.page_ranges(pdf_path)
+                    shards[position] = [None] * len(ranges)
+                    remaining[position] = len(ranges)
+                    for shard_index, page_range in enumerate(ranges):
+                        futures[pool.submit(_partition_in_worker, pdf_path, page_range)] = (position, shard_index)
+
+                if next_position in completed:
+                    yield file_names[next_position], completed.pop(next_position)
+                    next_position += 1
+                    continue
+
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    position, shard_index = futures.pop(future)
+                    file_name = file_names[position]
+                    try:
+                        shards[position][shard_index] = future.result()
+                    except Exception as e:
+                        self.logger.error(f"Error extracting from {file_name}: {e}")
+                        failed.add(position)
+
+                    remaining[position] -= 1
+                    if remaining[position]:
+                        continue
+
+                    parts = shards.pop(position)
+                    del remaining[position]
+                    if position in failed:
+                        self.logger.error(f"Skipping {file_name} due to extraction errors.")
+                        completed[position] = None
+                    else:
+                        elements = parts[0] if len(parts) == 1 else self.stitch(parts)
+                        completed[position] = self.elements_to_entries(elements, os.path.join(self.pdf_folder, file_name))
+                        self._cache_put(cache_keys[position], completed[position])
+                        self.logger.info(f"Finished {file_name}")
+
+    def iter_pdfs(self, file_names=None):
+        # Yields (file name, (text, tables, images)) in file-name order; the entries are None
+        # for a file whose extraction failed.
+        if not os.path.isdir(self.pdf_folder):
+            self.logger.error(f"PDF folder not found: {self.pdf_folder}")
+            return
+
+        file_names = self._pdf_file_names(file_names)
+        if self.workers > 1 and len(file_names) > 1:
+            yield from self._iter_parallel(file_names)
+        else:
+            yield from self._iter_serial(file_names)
+
+    def process_pdfs(self, file_names=None):
         all_text_elements = []
         all_table_elements = []
         all_image_elements = []
 
-        if not os.path.isdir(self.pdf_folder):
-             self.logger.error(f"PDF folder not found: {self.pdf_folder}")
-             return [], [], []
-
-        for file_name in os.listdir(self.pdf_folder):
-            if file_name.endswith(".pdf"):
-                pdf_path = os.path.join(self.pdf_folder, file_name)
-                self.logger.info(f"Processing {file_name}")
-
-                try:
-                    text, tables, images = self.extract_pdf_elements(pdf_path)
-                    all_text_elements.extend(text)
-                    all_table_elements.extend(tables)
-                    all_image_elements.extend(images)
-                except Exception as e:
-                    self.logger.error(f"Skipping {file_name} due to error: {e}")
+        for _, result in self.iter_pdfs(file_names):
+            if result is None:
+                continue
+            text, tables, images = result
+            all_text_elements.extend(text)
+            all_table_elements.extend(tables)
+            all_image_elements.extend(images)
 
         self.logger.info(f"Extracted {len(all_text_elements)} text elements, {len(all_table_elements)} table elements and {len(all_image_elements)} images elements.")
 
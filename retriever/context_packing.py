@@ -0,0 +1,85 @@
+import re
+import math
+import logging
+from collections import Counter
+from utils import token_counting
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+PASSAGE_SEPARATOR = "\n\n"
+
+def _term_vector(text):
+    return Counter(re.findall(r"\w+", text.lower()))
+
+def _cosine(a, b):
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b[term] for term, count in a.items() if term in b)
+    return dot / (math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values())))
+
+def _relevance(docs):
+    # Fused scores min-max normalized to [0, 1]; documents without one fall back to rank order.
+    scores = [doc.metadata.get("fusion_score") for doc in docs]
+    if any(score is None for score in scores):
+        scores = [float(len(docs) - i) for i in range(len(docs))]
+    low, high = min(scores), max(scores)
+    return [(score - low) / (high - low) if high > low else 1.0 for score in scores]
+
+def mmr_order(docs, mmr_lambda=0.7, redundancy_threshold=0.9):
+    # Maximal marginal relevance over lexical (term-frequency cosine) similarity, which needs no
+    # extra embedding calls at query time. Passages nearly identical to an already selected one
+    # are dropped. Returns the selected documents with their relevance, in selection order.
+    relevance = _relevance(docs)
+    vectors = [_term_vector(doc.page_content) for doc in docs]
+    remaining = list(range(len(docs)))
+    selected = []
+    while remaining:
+        best, best_score, best_similarity = None, None, 0.0
+        for i in remaining:
+            similarity = max((_cosine(vectors[i], vectors[j]) for j in selected), default=0.0)
+            score = mmr_lambda * relevance[i] - (1 - mmr_lambda) * similarity
+            if best_score is None or score > best_score:
+                best, best_score, best_similarity = i, score, similarity
+        remaining.remove(best)
+        if best_similarity < redundancy_threshold:
+            selected.append(best)
+    return [(docs[i], relevance[i]) for i in selected]
+
+def trim_to_sentences(text, max_tokens, count_tokens=token_counting.count_tokens):
+    # Longest prefix made of whole sentences that fits in max_tokens ("" if not even one does).
+    kept = []
+    for sentence in SENTENCE_BOUNDARY.split(text.strip()):
+        candidate = " ".join(kept + [sentence])
+        if count_tokens(candidate) > max_tokens:
+            break
+        kept.append(sentence)
+    return " ".join(kept)
+
+def pack_context(docs, token_budget, mmr_lambda=0.7, min_passage_tokens=40, count_tokens=token_counting.count_tokens):
+    # Picks passages in MMR order until token_budget is spent, trimming the passage that would
+    # overflow at a sentence boundary, then lays them out by fused relevance. Returns the
+    # context string and the number of tokens packed.
+    if not docs:
+        return "", 0
+    separator_tokens = count_tokens(PASSAGE_SEPARATOR)
+    packed = []
+    used = 0
+    for doc, relevance in mmr_order(docs, mmr_lambda):
+        available = token_budget - used - (separator_tokens if packed else 0)
+        if available < min_passage_tokens:
+            break
+        text = doc.page_content.strip()
+        tokens = count_tokens(text)
+        if tokens > available:
+            text = trim_to_sentences(text, available, count_tokens)
+            if not text:
+                continue
+            tokens = count_tokens(text)
+        packed.append((relevance, text))
+        used += tokens + (separator_tokens if len(packed) > 1 else 0)
+
+    packed.sort(key=lambda item: item[0], reverse=True)
+    context = PASSAGE_SEPARATOR.join(text for _, text in packed)
+    logger.info(f"Packed {len(packed)} of {len(docs)} passages into {used} context tokens (budget {token_budget}).")
+    return context, used
\ No newline at end of file
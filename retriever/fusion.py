@@ -0,0 +1,72 @@
+from langchain_core.documents import Document
+
+def _doc_key(doc):
+    return doc.page_content
+
+def _collect(ranked_lists):
+    # ranked_lists: {retriever_name: [(Document, score), ...]} with each list best-first and
+    # higher scores better. Returns the unique documents and their per-retriever rank/score.
+    docs = {}
+    provenance = {}
+    for name, ranked in ranked_lists.items():
+        for rank, (doc, score) in enumerate(ranked, 1):
+            key = _doc_key(doc)
+            if key not in docs:
+                docs[key] = doc
+                provenance[key] = {}
+            if name not in provenance[key]:
+                provenance[key][name] = (rank, score)
+    return docs, provenance
+
+def reciprocal_rank_fusion(ranked_lists, weights=None, rrf_k=60):
+    docs, provenance = _collect(ranked_lists)
+    fused = {}
+    for key, hits in provenance.items():
+        fused[key] = sum((weights or {}).get(name, 1.0) / (rrf_k + rank) for name, (rank, _) in hits.items())
+    return docs, provenance, fused
+
+def weighted_score_fusion(ranked_lists, weights=None):
+    # Min-max normalizes each retriever's scores to [0, 1] before taking the weighted sum,
+    # so BM25 scores and vector similarities are on a comparable scale.
+    docs, provenance = _collect(ranked_lists)
+    bounds = {}
+    for name, ranked in ranked_lists.items():
+        scores = [score for _, score in ranked]
+        if scores:
+            bounds[name] = (min(scores), max(scores))
+
+    fused = {}
+    for key, hits in provenance.items():
+        total = 0.0
+        for name, (_, score) in hits.items():
+            low, high = bounds[name]
+            normalized = (score - low) / (high - low) if high > low else 1.0
+            total += (weights or {}).get(name, 1.0) * normalized
+        fused[key] = total
+    return docs, provenance, fused
+
+FUSION_METHODS = {
+    "rrf": reciprocal_rank_fusion,
+    "weighted": weighted_score_fusion,
+}
+
+def fuse(ranked_lists, method="rrf", k=10, **kwargs):
+    if method not in FUSION_METHODS:
+        raise ValueError(f"Unknown fusion method '{method}'. Expected one of {sorted(FUSION_METHODS)}.")
+
+    docs, provenance, fused = FUSION_METHODS[method](ranked_lists, **kwargs)
+    ranked_keys = sorted(fused, key=lambda key: fused[key], reverse=True)[:k]
+
+    results = []
+    for fused_rank, key in enumerate(ranked_keys, 1):
+        doc = docs[key]
+        metadata = dict(doc.metadata or {})
+        metadata["fusion_method"] = method
+        metadata["fusion_score"] = fused[key]
+        metadata["fusion_rank"] = fused_rank
+        metadata["retrieved_by"] = ",".join(sorted(provenance[key]))
+        for name, (rank, score) in provenance[key].items():
+            metadata[f"{name}_rank"] = rank
+            metadata[f"{name}_score"] = score
+        results.append(Document(id=getattr(doc, "id", None), page_content=doc.page_content, metadata=metadata))
+    return results
\ No newline at end of file
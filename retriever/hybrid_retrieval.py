@@ -1,27 +1,76 @@
-from nltk.tokenize import word_tokenize
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.documents import Document
-from models.embedding_model import embedding_model
-from models.bm25_model import bm25, docs
+from models.embedding_model import get_embedding_model
+from models.bm25_model import get_bm25_index, tokenize
+from retriever.fusion import fuse
+from config import HYBRID_FUSION_METHOD, HYBRID_FUSION_WEIGHTS, HYBRID_RRF_K, HYBRID_MAX_WORKERS
 
-def hybrid_retrieve(query, vectorstore, k=10):
-    if not docs:
-        query_embedding = embedding_model.embed_query(query)
-        dense_docs = vectorstore.similarity_search_by_vector(query_embedding, k=k*2)
-        return dense_docs[:k]
+executor = ThreadPoolExecutor(max_workers=HYBRID_MAX_WORKERS, thread_name_prefix="hybrid-retrieval")
 
-    query_embedding = embedding_model.embed_query(query)
-    dense_docs = vectorstore.similarity_search_by_vector(query_embedding, k=k)
+def dense_retrieve(query, vectorstore, k=10):
+    # Chroma returns distances; negate them so every retriever reports "higher is better".
+    query_embedding = get_embedding_model().embed_query(query)
+    results = vectorstore.similarity_search_by_vector_with_relevance_scores(query_embedding, k=k)
+    return [(doc, -distance) for doc, distance in results]
 
-    bm25_query = word_tokenize(query.lower())
-    sparse_scores = bm25.get_scores(bm25_query)
-    top_k_indices = sorted(range(len(sparse_scores)), key=lambda x: sparse_scores[x], reverse=True)[:k]
-    sparse_docs = [Document(page_content=docs[i]) for i in top_k_indices]
+def sparse_retrieve(query, vectorstore, k=10):
+    hits = get_bm25_index().search(tokenize(query), k)
+    if not hits:
+        return []
 
+    hit_ids = [doc_id for doc_id, _ in hits]
+    fetched = vectorstore.get(ids=hit_ids, include=["documents", "metadatas"])
+    found = {
+        doc_id: (content, metadata)
+        for doc_id, content, metadata in zip(fetched["ids"], fetched["documents"], fetched["metadatas"])
+    }
+
+    sparse_docs = []
+    for doc_id, score in hits:
+        if doc_id in found:
+            content, metadata = found[doc_id]
+            sparse_docs.append((Document(id=doc_id, page_content=content, metadata=metadata or {}), score))
+    return sparse_docs
+
+def _fusion_kwargs(fusion_method):
+    if fusion_method == "rrf":
+        return {"weights": HYBRID_FUSION_WEIGHTS, "rrf_k": HYBRID_RRF_K}
+    return {"weights": HYBRID_FUSION_WEIGHTS}
+
+def hybrid_retrieve(query, vectorstore, k=10, fusion_method=HYBRID_FUSION_METHOD):
+    dense_future = executor.submit(dense_retrieve, query, vectorstore, k)
+    ranked_lists = {}
+
+    if get_bm25_index().num_docs:
+        sparse_future = executor.submit(sparse_retrieve, query, vectorstore, k)
+        ranked_lists["sparse"] = sparse_future.result()
+    ranked_lists["dense"] = dense_future.result()
+
+    return fuse(ranked_lists, method=fusion_method, k=k, **_fusion_kwargs(fusion_method))
+
+def with_parent_documents(docs, docstore, id_key="doc_id"):
+    # Swaps retrieved summaries for the parent content kept in the docstore, using one batched
+    # lookup. Image parents are blob digests, not text, so image hits keep their summary; the
+    # summary is kept in the metadata either way. Hits sharing a parent collapse to the first.
+    parent_ids = [doc.metadata.get(id_key) for doc in docs]
+    parents = docstore.mget([parent_id for parent_id in parent_ids if parent_id])
+    parents_by_id = dict(zip([parent_id for parent_id in parent_ids if parent_id], parents))
+
+    resolved = []
     seen = set()
-    unique_docs = []
-    for doc in dense_docs + sparse_docs:
-        if doc.page_content not in seen:
-            unique_docs.append(doc)
-            seen.add(doc.page_content)
+    for doc, parent_id in zip(docs, parent_ids):
+        if parent_id in seen:
+            continue
+        if parent_id:
+            seen.add(parent_id)
 
-    return unique_docs[:k]
\ No newline at end of file
+        parent = parents_by_id.get(parent_id)
+        if not isinstance(parent, str) or doc.metadata.get("type") == "image":
+            resolved.append(doc)
+            continue
+        resolved.append(Document(
+            id=doc.id,
+            page_content=parent,
+            metadata={**doc.metadata, "summary": doc.page_content},
+        ))
+    return resolved
@@ -3,17 +3,23 @@ import logging
 from langchain.storage import InMemoryStore
 from langchain.retrievers.multi_vector import MultiVectorRetriever
 from langchain_core.documents import Document
+from langchain_community.vectorstores.utils import filter_complex_metadata
 
 class MultiVectorRetrieverBuilder:
-    def __init__(self, vectorstore, text_elements, text_summaries, table_elements, table_summaries, img_base64_list, image_summaries):
+    def __init__(self, vectorstore, text_elements, text_summaries, table_elements, table_summaries, image_digests, image_summaries,
+                 text_metadatas=None, table_metadatas=None, image_metadatas=None, store=None):
         self.vectorstore = vectorstore
         self.text_elements = text_elements
         self.text_summaries = text_summaries or []
         self.table_elements = table_elements
         self.table_summaries = table_summaries
-        self.img_base64_list = img_base64_list
+        self.image_digests = image_digests
         self.image_summaries = image_summaries
-        self.store = InMemoryStore()
+        self.text_metadatas = text_metadatas
+        self.table_metadatas = table_metadatas
+        self.image_metadatas = image_metadatas
+        # Pass a persistent store (see models.docstore) to keep parents after the process exits.
+        self.store = store if store is not None else InMemoryStore()
         self.id_key = "doc_id"
         self.logger = self.setup_logger()
         self.retriever = None
@@ -26,27 +32,38 @@ class MultiVectorRetrieverBuilder:
         for i in range(0, len(lst), chunk_size):
             yield lst[i:i + chunk_size]
 
-    def add_documents(self, doc_summaries, doc_contents, batch_size=5000):
+    def add_documents(self, doc_summaries, doc_contents, metadatas=None, batch_size=5000, ids=None):
+        # With ids, summaries are upserted into the vectorstore under those ids, so adding the
+        # same documents again replaces them. Returns the ids that were written; a failed write
+        # is logged and re-raised so callers never record a partial batch as indexed.
         if len(doc_summaries) != len(doc_contents):
             self.logger.error(f"Mismatch between summary count ({len(doc_summaries)}) and content count ({len(doc_contents)}). Skipping adding documents.")
-            return
+            return []
 
         if not doc_summaries:
             self.logger.info("No documents to add.")
-            return
+            return []
 
-        doc_ids = [str(uuid.uuid4()) for _ in doc_contents]
-        summary_docs = [Document(page_content=s, metadata={self.id_key: doc_ids[i]}) for i, s in enumerate(doc_summaries)]
+        doc_ids = ids or [str(uuid.uuid4()) for _ in doc_contents]
+        metadatas = metadatas or [{} for _ in doc_summaries]
+        summary_docs = filter_complex_metadata([
+            Document(page_content=s, metadata={**metadatas[i], self.id_key: doc_ids[i]}) for i, s in enumerate(doc_summaries)
+        ])
         content_tuples = list(zip(doc_ids, doc_contents))
 
+        added_ids = []
         try:
             for doc_chunk, content_chunk in zip(self.chunk_list(summary_docs, batch_size), self.chunk_list(content_tuples, batch_size)):
-                self.vectorstore.add_documents(doc_chunk)
+                chunk_ids = [doc_id for doc_id, _ in content_chunk]
+                self.vectorstore.add_documents(doc_chunk, ids=chunk_ids)
                 self.store.mset(content_chunk)
+                added_ids.extend(chunk_ids)
                 self.logger.info(f"Added chunk of {len(doc_chunk)} documents.")
             self.logger.info(f"Successfully added {len(doc_summaries)} documents and their contents to the retriever stores.")
         except Exception as e:
-            self.logger.error(f"Failed to add documents to retriever stores: {e}")
+            self.logger.error(f"Failed to add documents to retriever stores after {len(added_ids)}/{len(doc_summaries)} documents: {e}")
+            raise
+        return added_ids
 
     def create_retriever(self):
         if self.vectorstore is None:
@@ -62,16 +79,16 @@ class MultiVectorRetrieverBuilder:
             
             if self.text_summaries:
                 self.logger.info("Indexing text summaries and storing text content.")
-                self.add_documents(self.text_summaries, self.text_elements)
+                self.add_documents(self.text_summaries, self.text_elements, self.text_metadatas)
             else:
                 self.logger.info("No text summaries provided. Indexing text chunks directly.")
-                self.add_documents(self.text_elements, self.text_elements)
+                self.add_documents(self.text_elements, self.text_elements, self.text_metadatas)
 
             self.logger.info("Adding table documents to retriever.")
-            self.add_documents(self.table_summaries, self.table_elements)
+            self.add_documents(self.table_summaries, self.table_elements, self.table_metadatas)
 
             self.logger.info("Adding image documents to retriever.")
-            self.add_documents(self.image_summaries, self.img_base64_list)
+            self.add_documents(self.image_summaries, self.image_digests, self.image_metadatas)
 
             self.logger.info("Retriever created successfully.")
             return self.retriever
@@ -0,0 +1,93 @@
+import random
+import asyncio
+import logging
+import threading
+
+
+class SummaryJob:
+    def __init__(self, call, tokens=0, label="", rate_limited=True, batched=False):
+        self.call = call
+        self.tokens = tokens
+        self.label = label
+        # False for jobs that will not hit the API (e.g. answered from a cache).
+        self.rate_limited = rate_limited
+        # True for jobs whose call returns a list of results, one per batched item.
+        self.batched = batched
+
+
+def is_rate_limit_error(error):
+    if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    text = f"{type(error).__name__} {error}"
+    return "429" in text or "ResourceExhausted" in text or "RESOURCE_EXHAUSTED" in text
+
+
+class AsyncSummarizationEngine:
+    # Runs summarization jobs with up to max_concurrency requests in flight, each admitted by a
+    # shared rate limiter. 429 responses are retried with exponential backoff and full jitter.
+    # Results come back in the order the jobs were given.
+    def __init__(self, limiter, max_concurrency=8, max_retries=5, base_delay=2.0, max_delay=60.0):
+        self.limiter = limiter
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.loop = None
+        self.loop_lock = threading.Lock()
+        self.logger = self.setup_logger()
+
+    def setup_logger(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        return logging.getLogger(__name__)
+
+    async def call_with_retry(self, call, tokens=0, label=""):
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire(tokens)
+            try:
+                return await call()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                self.logger.info(f"Rate limited on {label or 'request'}; retrying in {delay:.2f} seconds.")
+                await asyncio.sleep(delay)
+
+    async def _run_job(self, job, semaphore):
+        if not job.rate_limited:
+            return await job.call()
+        async with semaphore:
+            return await self.call_with_retry(job.call, job.tokens, job.label)
+
+    async def run(self, jobs):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        results = await asyncio.gather(*(self._run_job(job, semaphore) for job in jobs))
+        flat = []
+        for job, result in zip(jobs, results):
+            if job.batched:
+                flat.extend(result)
+            else:
+                flat.append(result)
+        return flat
+
+    def run_sync(self, jobs):
+        jobs = list(jobs)
+        if not jobs:
+            return []
+        self.logger.info(f"Running {len(jobs)} summarization requests with up to {self.max_concurrency} in flight.")
+        return asyncio.run_coroutine_threadsafe(self.run(jobs), self.event_loop()).result()
+
+    def event_loop(self):
+        # Every run_sync call shares one event loop running on a daemon thread for the engine's
+        # lifetime. Async LLM clients bind to the loop they first run on, so a fresh loop per
+        # call would leave them tied to a closed one.
+        with self.loop_lock:
+            if self.loop is None or self.loop.is_closed():
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target=self.loop.run_forever, name="summarization-loop", daemon=True).start()
+            return self.loop
+
+    def close(self):
+        with self.loop_lock:
+            if self.loop is not None and not self.loop.is_closed():
+                self.loop.call_soon_threadsafe(self.loop.stop)
+            self.loop = None
\ No newline at end of file
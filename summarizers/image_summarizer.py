@@ -1,18 +1,23 @@
-import time
 import logging
 from langchain_google_genai import ChatGoogleGenerativeAI
 from models.prompt_templates import image_summarizer_prompt_template
+from models.llm_model import gemini_client_kwargs
 from langchain_core.output_parsers import StrOutputParser
+from summarizers.async_engine import AsyncSummarizationEngine, SummaryJob
+from summarizers.rate_limiter import TokenBucketRateLimiter, estimate_tokens
 
 class ImageSummarizer:
-    def __init__(self, api_key, model="gemini-2.0-flash", max_requests_per_minute=14):
+    def __init__(self, api_key, model="gemini-2.0-flash", max_requests_per_minute=14, engine=None, llm=None, cache=None, blob_store=None):
         self.api_key = api_key
         self.model = model
         self.max_requests_per_minute = max_requests_per_minute
-        self.first_request_time = time.time()
-        self.request_counter = 0
+        self.cache = cache
+        # With a blob store, image entries carry digests and the payload is read only when sent.
+        self.blob_store = blob_store
+        # Pass a shared engine to budget tables and images together.
+        self.engine = engine or AsyncSummarizationEngine(TokenBucketRateLimiter(max_requests_per_minute))
 
-        self.llm = ChatGoogleGenerativeAI(api_key=self.api_key, model=self.model)
+        self.llm = llm or ChatGoogleGenerativeAI(api_key=self.api_key, model=self.model, **gemini_client_kwargs())
         self.summarizer_chain = image_summarizer_prompt_template | self.llm | StrOutputParser()
 
         self.logger = self.setup_logger()
@@ -21,45 +26,79 @@ class ImageSummarizer:
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
         return logging.getLogger(__name__)
 
-    def generate_summary(self, base64_str: str, metadata: dict):
-        self.logger.debug("Generating image summary...")
-
+    def prompt_inputs(self, image: str, metadata: dict):
         metadata_text = "\n".join([f"{k}: {v}" for k, v in metadata.items()])
-        summary = self.summarizer_chain.invoke({
-            "image": base64_str,
+        return {
+            "image": image,
             "metadata": metadata_text
-        })
+        }
+
+    def payload_inputs(self, inputs):
+        if self.blob_store is None:
+            return inputs
+        return {**inputs, "image": self.blob_store.read_base64(inputs["image"])}
+
+    def prompt_tokens(self, inputs):
+        if self.blob_store is None:
+            return estimate_tokens(image_summarizer_prompt_template.format(**inputs))
+        payload_length = 4 * ((self.blob_store.size(inputs["image"]) + 2) // 3)
+        return estimate_tokens(image_summarizer_prompt_template.format(**{**inputs, "image": ""})) + payload_length // 4
+
+    def cached_summary(self, inputs):
+        if self.cache is None:
+            return None, None
+        key = self.cache.key(inputs["image"], inputs["metadata"], image_summarizer_prompt_template.template, self.model)
+        return key, self.cache.get(key)
+
+    def generate_summary(self, image: str, metadata: dict):
+        inputs = self.prompt_inputs(image, metadata)
+        key, summary = self.cached_summary(inputs)
+        if summary is not None:
+            return summary
+
+        self.logger.debug("Generating image summary...")
+        summary = self.summarizer_chain.invoke(self.payload_inputs(inputs))
+        if key is not None:
+            self.cache.put(key, summary)
         return summary
 
-    def summarize_images(self, image_entries):
-        summaries = []
-        img_base64_list = []
+    async def _asummarize(self, inputs, key):
+        self.logger.debug("Generating image summary...")
+        summary = await self.summarizer_chain.ainvoke(self.payload_inputs(inputs))
+        if key is not None:
+            self.cache.put(key, summary)
+        return summary
 
-        self.logger.info(f"Summarizing {len(image_entries)} images.")
+    async def agenerate_summary(self, image: str, metadata: dict):
+        inputs = self.prompt_inputs(image, metadata)
+        key, summary = self.cached_summary(inputs)
+        if summary is None:
+            summary = await self._asummarize(inputs, key)
+        return summary
 
+    def image_jobs(self, image_entries):
+        jobs = []
         for idx, entry in enumerate(image_entries, 1):
-            if self.request_counter >= self.max_requests_per_minute:
-                elapsed = time.time() - self.first_request_time
-                if elapsed < 60:
-                    wait_time = 60 - elapsed
-                    self.logger.info(f"Rate limit hit. Sleeping for {wait_time:.2f} seconds.")
-                    time.sleep(wait_time)
-                self.first_request_time = time.time()
-                self.request_counter = 0
-
-            self.logger.info(f"Processing image {idx}/{len(image_entries)}")
-
-            base64_img = entry.get("content")
+            image_content = entry.get("content")
             metadata = entry.get("metadata")
 
-            summary = self.generate_summary(base64_img, metadata)
-            summaries.append({
-                "summary": summary,
-                "metadata": metadata
-            })
-            img_base64_list.append(base64_img)
-            self.logger.info(f"Summary for image {idx} completed.")
+            inputs = self.prompt_inputs(image_content, metadata)
+            key, cached = self.cached_summary(inputs)
+
+            async def call(inputs=inputs, key=key, cached=cached, metadata=metadata, idx=idx):
+                summary = cached if cached is not None else await self._asummarize(inputs, key)
+                self.logger.info(f"Summary for image {idx}/{len(image_entries)} completed.")
+                return {
+                    "summary": summary,
+                    "metadata": metadata
+                }
 
-            self.request_counter += 1
+            tokens = self.prompt_tokens(inputs) if cached is None else 0
+            jobs.append(SummaryJob(call, tokens=tokens, label=f"image {idx}", rate_limited=cached is None))
+        return jobs
 
-        return summaries, img_base64_list
\ No newline at end of file
+    def summarize_images(self, image_entries):
+        self.logger.info(f"Summarizing {len(image_entries)} images.")
+        summaries = self.engine.run_sync(self.image_jobs(image_entries))
+        image_contents = [entry.get("content") for entry in image_entries]
+        return summaries, image_contents
\ No newline at end of file
@@ -0,0 +1,61 @@
+import time
+import asyncio
+import threading
+
+
+def estimate_tokens(text):
+    # Rough count used only for budgeting (about four characters per token).
+    return max(1, len(text) // 4)
+
+
+class TokenBucketRateLimiter:
+    # Two token buckets, one for requests and one for prompt tokens per minute, refilled
+    # continuously. The lock is a threading.Lock held only for bookkeeping, so one limiter can be
+    # shared by coroutines on different event loops and by plain threads.
+    def __init__(self, requests_per_minute, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.request_allowance = float(requests_per_minute)
+        self.token_allowance = float(tokens_per_minute or 0)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.last_refill
+        self.last_refill = now
+        self.request_allowance = min(self.requests_per_minute, self.request_allowance + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self.token_allowance = min(self.tokens_per_minute, self.token_allowance + elapsed * self.tokens_per_minute / 60)
+
+    def _try_acquire(self, tokens):
+        # Returns 0 when the request may proceed, otherwise how long to wait before retrying.
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens_per_minute:
+                tokens = min(tokens, self.tokens_per_minute)
+            else:
+                tokens = 0
+
+            request_wait = max(0.0, (1 - self.request_allowance) * 60 / self.requests_per_minute)
+            token_wait = max(0.0, (tokens - self.token_allowance) * 60 / self.tokens_per_minute) if tokens else 0.0
+            wait = max(request_wait, token_wait)
+            if wait > 0:
+                return wait
+
+            self.request_allowance -= 1
+            self.token_allowance -= tokens
+            return 0.0
+
+    async def acquire(self, tokens=0):
+        while True:
+            wait = self._try_acquire(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def acquire_blocking(self, tokens=0):
+        while True:
+            wait = self._try_acquire(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
\ No newline at end of file
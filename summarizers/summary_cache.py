@@ -0,0 +1,71 @@
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+
+
+class SummaryCache:
+    # Durable cache of LLM summaries in a SQLite file. The key hashes everything that determines
+    # the output (content, metadata text, prompt template text, model name), so editing a prompt
+    # only invalidates entries produced with the old template.
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.logger = self.setup_logger()
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, summary TEXT NOT NULL)")
+        self.conn.commit()
+
+    def setup_logger(self):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        return logging.getLogger(__name__)
+
+    def key(self, content, metadata_text, prompt_template, model_name):
+        payload = json.dumps([content, metadata_text, prompt_template, model_name])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key, *alternate_keys):
+        # Returns the summary for the first key present; counts as a single hit or miss.
+        with self.lock:
+            for candidate in (key, *alternate_keys):
+                row = self.conn.execute("SELECT summary FROM summaries WHERE key = ?", (candidate,)).fetchone()
+                if row is not None:
+                    self.hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key, summary):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO summaries (key, summary) VALUES (?, ?)", (key, summary))
+            self.conn.commit()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def log_stats(self):
+        stats = self.stats()
+        self.logger.info(
+            f"Summary cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.1%} hit rate)."
+        )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
\ No newline at end of file
@@ -1,19 +1,35 @@
-import time
+import re
+import json
+import asyncio
 import logging
 from langchain_google_genai import ChatGoogleGenerativeAI
-from models.prompt_templates import table_summarizer_prompt_template
+from models.prompt_templates import table_summarizer_prompt_template, batched_table_summarizer_prompt_template
+from models.llm_model import gemini_client_kwargs
 from langchain_core.output_parsers import StrOutputParser
+from summarizers.async_engine import AsyncSummarizationEngine, SummaryJob
+from summarizers.rate_limiter import TokenBucketRateLimiter, estimate_tokens
 
 class TableSummarizer:
-    def __init__(self, api_key, model="gemini-2.0-flash", max_requests_per_minute=14):
+    def __init__(self, api_key, model="gemini-2.0-flash", max_requests_per_minute=14, engine=None, llm=None, cache=None,
+                 batch_token_budget=0, max_batch_size=8, batch_output_budget=6000, summary_output_tokens=600):
         self.api_key = api_key
         self.model = model
         self.max_requests_per_minute = max_requests_per_minute
-        self.first_request_time = time.time()
-        self.request_counter = 0
+        self.cache = cache
+        # Pass a shared engine to budget tables and images together.
+        self.engine = engine or AsyncSummarizationEngine(TokenBucketRateLimiter(max_requests_per_minute))
+        # With a positive budget, consecutive tables are packed into one request of at most
+        # batch_token_budget prompt tokens and max_batch_size tables. The replies must also fit
+        # in one response, so a batch holds at most batch_output_budget tokens of summaries,
+        # assuming summary_output_tokens per table.
+        self.batch_token_budget = batch_token_budget
+        self.max_batch_size = max_batch_size
+        self.batch_output_budget = batch_output_budget
+        self.summary_output_tokens = summary_output_tokens
 
-        self.llm = ChatGoogleGenerativeAI(api_key=self.api_key, model=self.model)
+        self.llm = llm or ChatGoogleGenerativeAI(api_key=self.api_key, model=self.model, **gemini_client_kwargs())
         self.summarizer_chain = table_summarizer_prompt_template | self.llm | StrOutputParser()
+        self.batch_summarizer_chain = batched_table_summarizer_prompt_template | self.llm | StrOutputParser()
 
         self.logger = self.setup_logger()
         
@@ -21,44 +37,191 @@ class TableSummarizer:
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
         return logging.getLogger(__name__)
 
-    def generate_summary(self, data: str, metadata: dict):
-        self.logger.debug("Generating summary for table...")
-        
+    @property
+    def batching(self):
+        return self.batch_token_budget > 0 and self.max_batch_size > 1
+
+    def prompt_inputs(self, data: str, metadata: dict):
         metadata_text = "\n".join([f"{k}: {v}" for k, v in metadata.items()])
-        summary = self.summarizer_chain.invoke({
+        return {
             "table_data": data,
             "metadata": metadata_text
-        })
-        
+        }
+
+    def cache_key(self, inputs, template):
+        if self.cache is None:
+            return None
+        return self.cache.key(inputs["table_data"], inputs["metadata"], template.template, self.model)
+
+    def cached_summary(self, inputs):
+        # Each summary is stored under the template that actually produced it: the single-table
+        # template for one-off requests and batch fallbacks, the batched one for tables answered
+        # in a batch. Either is served, so toggling batching keeps earlier summaries. Returns the
+        # single-table key, under which a newly generated summary is stored.
+        if self.cache is None:
+            return None, None
+        key = self.cache_key(inputs, table_summarizer_prompt_template)
+        return key, self.cache.get(key, self.cache_key(inputs, batched_table_summarizer_prompt_template))
+
+    def generate_summary(self, data: str, metadata: dict):
+        inputs = self.prompt_inputs(data, metadata)
+        key, summary = self.cached_summary(inputs)
+        if summary is not None:
+            return summary
+
+        self.logger.debug("Generating summary for table...")
+        summary = self.summarizer_chain.invoke(inputs)
+        if key is not None:
+            self.cache.put(key, summary)
         return summary
 
-    def summarize_tables(self, table_entries):
-        summaries = []
-        self.logger.info(f"Started generating summaries for {len(table_entries)} tables.")
+    async def _asummarize(self, inputs, key):
+        self.logger.debug("Generating summary for table...")
+        summary = await self.summarizer_chain.ainvoke(inputs)
+        if key is not None:
+            self.cache.put(key, summary)
+        return summary
 
-        for idx, entry in enumerate(table_entries, 1):
-            if self.request_counter >= self.max_requests_per_minute:
-                elapsed = time.time() - self.first_request_time
-                if elapsed < 60:
-                    wait_time = 60 - elapsed
-                    self.logger.info(f"Rate limit hit. Sleeping for {wait_time:.2f} seconds.")
-                    time.sleep(wait_time)
-                self.first_request_time = time.time()
-                self.request_counter = 0
+    async def agenerate_summary(self, data: str, metadata: dict):
+        inputs = self.prompt_inputs(data, metadata)
+        key, summary = self.cached_summary(inputs)
+        if summary is None:
+            summary = await self._asummarize(inputs, key)
+        return summary
+
+    def format_table_batch(self, items):
+        return "\n\n".join(
+            f"### Table {number}\nTable Data:\n{item['inputs']['table_data']}\n\nMetadata:\n{item['inputs']['metadata']}"
+            for number, item in enumerate(items, 1)
+        )
+
+    def parse_batch_response(self, response, count):
+        # Returns {table number: summary} for every well-formed entry; anything missing is
+        # summarized again on its own by the caller. A reply cut off by the output limit still
+        # yields the entries that were completed before the cut.
+        text = re.sub(r"^```(?:json)?\s*", "", response.strip())
+        text = re.sub(r"\s*```$", "", text)
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = self._complete_array_items(text)
+        if not isinstance(data, list):
+            return {}
 
-            self.logger.info(f"Processing table {idx}/{len(table_entries)}")
+        summaries = {}
+        for item in data:
+            if not isinstance(item, dict):
+                continue
+            table_id, summary = item.get("table_id"), item.get("summary")
+            if isinstance(table_id, int) and 1 <= table_id <= count and isinstance(summary, str) and summary.strip():
+                summaries[table_id] = summary.strip()
+        return summaries
 
+    def _complete_array_items(self, text):
+        decoder = json.JSONDecoder()
+        position = text.find("[") + 1
+        if not position:
+            return []
+        items = []
+        while True:
+            while position < len(text) and text[position] in " \t\r\n,":
+                position += 1
+            if position >= len(text) or text[position] == "]":
+                return items
+            try:
+                item, position = decoder.raw_decode(text, position)
+            except ValueError:
+                return items
+            items.append(item)
+
+    async def _asummarize_batch(self, items):
+        response = await self.batch_summarizer_chain.ainvoke({"tables": self.format_table_batch(items)})
+        parsed = self.parse_batch_response(response, len(items))
+        for number, summary in parsed.items():
+            if items[number - 1]["key"] is not None:
+                self.cache.put(self.cache_key(items[number - 1]["inputs"], batched_table_summarizer_prompt_template), summary)
+
+        # Tables the batch did not answer are summarized with the single-table template and
+        # cached under its key by _asummarize.
+        missing = [number for number in range(1, len(items) + 1) if number not in parsed]
+        if missing:
+            self.logger.warning(f"Batched table response was missing {len(missing)}/{len(items)} summaries; summarizing them one by one.")
+            retried = await asyncio.gather(*(
+                self.engine.call_with_retry(
+                    lambda item=items[number - 1]: self._asummarize(item["inputs"], item["key"]),
+                    tokens=items[number - 1]["tokens"],
+                    label=f"table {items[number - 1]['idx']}",
+                )
+                for number in missing
+            ))
+            parsed.update(zip(missing, retried))
+
+        results = []
+        for number, item in enumerate(items, 1):
+            results.append({
+                "summary": parsed[number],
+                "metadata": item["metadata"]
+            })
+        self.logger.info(f"Summaries for tables {items[0]['idx']}-{items[-1]['idx']} completed in one request.")
+        return results
+
+    def _single_job(self, item, total):
+        async def call():
+            summary = item["cached"] if item["cached"] is not None else await self._asummarize(item["inputs"], item["key"])
+            self.logger.info(f"Summary for table {item['idx']}/{total} completed.")
+            return {
+                "summary": summary,
+                "metadata": item["metadata"]
+            }
+
+        return SummaryJob(call, tokens=item["tokens"], label=f"table {item['idx']}", rate_limited=item["cached"] is None)
+
+    def _batch_job(self, items, total):
+        if len(items) == 1:
+            return self._single_job(items[0], total)
+        tokens = estimate_tokens(batched_table_summarizer_prompt_template.format(tables=self.format_table_batch(items)))
+        return SummaryJob(
+            lambda: self._asummarize_batch(items),
+            tokens=tokens,
+            label=f"tables {items[0]['idx']}-{items[-1]['idx']}",
+            batched=True,
+        )
+
+    def table_jobs(self, table_entries):
+        items = []
+        for idx, entry in enumerate(table_entries, 1):
             content = entry.get("content")
             table_data_str = content.get("text", content.get("html"))
             metadata = entry.get("metadata")
-            
-            summary = self.generate_summary(table_data_str, metadata)
-            summaries.append({
-                "summary": summary,
-                "metadata": metadata
-            })
-            self.logger.info(f"Summary for table {idx} completed.")
-            
-            self.request_counter += 1
 
-        return summaries
\ No newline at end of file
+            inputs = self.prompt_inputs(table_data_str, metadata)
+            key, cached = self.cached_summary(inputs)
+            tokens = estimate_tokens(table_summarizer_prompt_template.format(**inputs)) if cached is None else 0
+            items.append({"idx": idx, "inputs": inputs, "metadata": metadata, "key": key, "cached": cached, "tokens": tokens})
+
+        if not self.batching:
+            return [self._single_job(item, len(items)) for item in items]
+
+        # Only consecutive uncached tables are packed together, so results stay in table order.
+        base_tokens = estimate_tokens(batched_table_summarizer_prompt_template.format(tables=""))
+        max_tables = min(self.max_batch_size, max(1, self.batch_output_budget // self.summary_output_tokens))
+        jobs, batch, batch_tokens = [], [], base_tokens
+        for item in items:
+            item_tokens = estimate_tokens(self.format_table_batch([item]))
+            if batch and (item["cached"] is not None or len(batch) >= max_tables
+                          or batch_tokens + item_tokens > self.batch_token_budget):
+                jobs.append(self._batch_job(batch, len(items)))
+                batch, batch_tokens = [], base_tokens
+
+            if item["cached"] is not None:
+                jobs.append(self._single_job(item, len(items)))
+            else:
+                batch.append(item)
+                batch_tokens += item_tokens
+        if batch:
+            jobs.append(self._batch_job(batch, len(items)))
+        return jobs
+
+    def summarize_tables(self, table_entries):
+        self.logger.info(f"Started generating summaries for {len(table_entries)} tables.")
+        return self.engine.run_sync(self.table_jobs(table_entries))
\ No newline at end of file
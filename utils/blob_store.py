@@ -0,0 +1,46 @@
+import os
+import base64
+
+from utils.hashing import bytes_sha256
+
+
+class BlobStore:
+    # Content-addressed store of raw bytes: each blob is written once under
+    # <root>/<first two hex chars>/<sha256>, and everything else only carries the digest.
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def exists(self, digest):
+        return os.path.isfile(self.path(digest))
+
+    def size(self, digest):
+        return os.path.getsize(self.path(digest))
+
+    def put(self, data):
+        digest = bytes_sha256(data)
+        path = self.path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return digest
+
+    def put_base64(self, data_base64):
+        return self.put(base64.b64decode(data_base64))
+
+    def open(self, digest):
+        return open(self.path(digest), "rb")
+
+    def read(self, digest):
+        # Callers (image decoding, base64 encoding) need the whole blob; use open() to stream it.
+        with self.open(digest) as f:
+            return f.read()
+
+    def read_base64(self, digest):
+        return base64.b64encode(self.read(digest)).decode()
\ No newline at end of file
@@ -1,6 +1,15 @@
 from models.prompt_templates import classification_prompt
+from models.retrieval_classifier import log_decision
 
-def needs_retrieval(query, llm):
+def needs_retrieval(query, llm, classifier=None, embeddings=None):
+    # The local classifier answers when it is confident and was trained on the same embedding
+    # model; otherwise the LLM decides, and its decision is logged for future training.
+    if classifier is not None and embeddings is not None and classifier.model_name == getattr(embeddings, "model_name", None):
+        decision = classifier.predict(embeddings.embed_query(query))
+        if decision is not None:
+            return decision
 
     response = llm.invoke(classification_prompt.format(query=query))
-    return response.content.strip().lower().startswith("y")
\ No newline at end of file
+    decision = response.content.strip().lower().startswith("y")
+    log_decision(query, decision)
+    return decision
\ No newline at end of file
@@ -1,13 +1,24 @@
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 from transformers import AutoTokenizer
 import logging
 
 class TextSplitter:
-    def __init__(self, chunk_size=512, chunk_overlap=50, model_name='BAAI/bge-large-en-v1.5'):
+    # Splits text elements into chunks of at most chunk_size tokens (special tokens included, as
+    # the embedding model sees them) with exactly chunk_overlap tokens shared between neighbours.
+    # Each element is tokenized once, in batches, with a fast tokenizer that reports character
+    # offsets; chunk ends are chosen by token index, preferring the latest boundary of the highest
+    # ranked separator in the window ("\n\n", then "\n", then " ", then anywhere).
+    def __init__(self, chunk_size=512, chunk_overlap=50, model_name='BAAI/bge-large-en-v1.5', batch_size=256):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.batch_size = batch_size
+        self.separators = ["\n\n", "\n", " ", ""]
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+        if not self.tokenizer.is_fast:
+            raise ValueError(f"{model_name} has no fast tokenizer; offset-based splitting needs one.")
+        self.max_tokens = chunk_size - self.tokenizer.num_special_tokens_to_add()
+        if self.max_tokens <= chunk_overlap:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than the usable chunk size ({self.max_tokens}).")
 
         self.logger = self.setup_logger()
 
@@ -15,26 +26,58 @@ class TextSplitter:
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
         return logging.getLogger(__name__)
 
-    def length_function(self, text):
-        return len(self.tokenizer.encode(text, truncation=False))
+    def separator_rank(self, gap):
+        for rank, separator in enumerate(self.separators[:-1]):
+            if separator in gap:
+                return rank
+        return len(self.separators) - 1
 
+    def split_offsets(self, text, offsets):
+        # offsets are (start, end) character spans of the element's tokens, without special tokens.
+        count = len(offsets)
+        if count == 0:
+            return []
+        if count <= self.max_tokens:
+            return [text[offsets[0][0]:offsets[-1][1]]]
 
-    def enforce_token_size(self, text_elements):
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap,
-            separators=["\n\n", "\n", " ", ""],
-            length_function=self.length_function
-        )
+        # boundary_ranks[i] ranks the text between token i - 1 and token i as a split point.
+        boundary_ranks = [0] + [self.separator_rank(text[offsets[i - 1][1]:offsets[i][0]]) for i in range(1, count)]
+
+        chunks = []
+        start = 0
+        while True:
+            end = min(start + self.max_tokens, count)
+            if end < count:
+                best_end, best_rank = end, boundary_ranks[end]
+                # Any end past start + overlap guarantees the next window moves forward.
+                for candidate in range(end - 1, start + self.chunk_overlap, -1):
+                    if boundary_ranks[candidate] < best_rank:
+                        best_end, best_rank = candidate, boundary_ranks[candidate]
+                        if best_rank == 0:
+                            break
+                end = best_end
+
+            chunks.append(text[offsets[start][0]:offsets[end - 1][1]])
+            if end >= count:
+                return chunks
+            start = end - self.chunk_overlap
 
+    def split_texts(self, texts):
+        results = []
+        for i in range(0, len(texts), self.batch_size):
+            batch = texts[i:i + self.batch_size]
+            encodings = self.tokenizer(batch, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+            for text, offsets in zip(batch, encodings["offset_mapping"]):
+                results.append(self.split_offsets(text, offsets))
+        return results
+
+    def enforce_token_size(self, text_elements):
         processed_docs = []
 
-        for element in text_elements:
-            original_text = element.get("content")
+        texts = [element.get("content") or "" for element in text_elements]
+        for element, split_texts in zip(text_elements, self.split_texts(texts)):
             metadata = element.get("metadata")
 
-            split_texts = text_splitter.split_text(original_text)
-
             for chunk in split_texts:
                 doc = Document(page_content=chunk, metadata=metadata)
                 processed_docs.append(doc)
@@ -0,0 +1,11 @@
+import tiktoken
+
+from models.registry import registry
+from config import CONTEXT_TOKEN_ENCODING
+
+registry.register("token_encoding", lambda: tiktoken.get_encoding(CONTEXT_TOKEN_ENCODING))
+
+
+def count_tokens(text):
+    # Special-token strings in retrieved text are counted as ordinary text instead of raising.
+    return len(registry.get("token_encoding").encode(text, disallowed_special=()))
\ No newline at end of file